@@ -2,25 +2,77 @@ from cvplibrary import CVPGlobalVariables, GlobalVariableNames, Device
 
 VLAN_ID = 1
 
+
+def spans(numbers):
+    numbers = sorted(numbers)
+    result = []
+    start = end = numbers[0]
+    for number in numbers[1:] + [None]:
+        if number == end + 1:
+            end = number
+            continue
+        result.append(str(start) if start == end else "%d-%d" % (start, end))
+        start = end = number
+    return tuple(result)
+
+
+def interface_ranges(names):
+    # One EOS range per slot and run of ports, e.g. Ethernet1-48 or Ethernet3/1-48
+    groups = {}
+    for name in names:
+        parts = name[len("Ethernet") :].split("/")
+        if not all(part.isdigit() for part in parts):
+            continue
+        prefix = "".join(part + "/" for part in parts[:-1])
+        groups.setdefault(prefix, []).append(int(parts[-1]))
+
+    def slot(prefix):
+        return tuple(int(part) for part in prefix.split("/") if part)
+
+    return [
+        "Ethernet" + prefix + span
+        for prefix in sorted(groups, key=slot)
+        for span in spans(groups[prefix])
+    ]
+
+
+def access_commands(interfaces):
+    return [
+        "interface " + interfaces,
+        "switchport",
+        "switchport mode access",
+        "switchport access vlan " + str(VLAN_ID),
+    ]
+
+
+def configure(device, commands):
+    return device.runCmds(["enable", "configure"] + commands)
+
+
 # Check if device is in ZTP mode
 if CVPGlobalVariables.getValue(GlobalVariableNames.ZTP_STATE) == "true":
     device_ip = CVPGlobalVariables.getValue(GlobalVariableNames.CVP_IP)
     device_user = CVPGlobalVariables.getValue(GlobalVariableNames.ZTP_USERNAME)
     device_pass = CVPGlobalVariables.getValue(GlobalVariableNames.ZTP_PASSWORD)
     device = Device(device_ip, device_user, device_pass)
-    SVIConfig = device.runCmds(
-        ["enable", "interface vlan " + str(VLAN_ID), "ip address dhcp"]
-    )[1]["response"]
     iflist = device.runCmds(["enable", "show interfaces status"])[1]["response"]
-    for item in iflist["interfaceStatuses"].keys():
-        if item.startswith("Ethernet"):
-            device.runCmds(
-                [
-                    "enable",
-                    "configure",
-                    "interface " + item,
-                    "switchport",
-                    "switchport mode access",
-                    "switchport access vlan " + str(VLAN_ID),
-                ]
-            )
+    configure(device, ["interface vlan " + str(VLAN_ID), "ip address dhcp"])
+    ranges = interface_ranges(
+        [item for item in iflist["interfaceStatuses"] if item.startswith("Ethernet")]
+    )
+    commands = []
+    for interfaces in ranges:
+        commands += access_commands(interfaces)
+    try:
+        if commands:
+            configure(device, commands)
+    except Exception:
+        # Configure the ranges one by one so a rejected one fails alone
+        failed = []
+        for interfaces in ranges:
+            try:
+                configure(device, access_commands(interfaces))
+            except Exception as exc:
+                failed.append("%s (%s)" % (interfaces, exc))
+        if failed:
+            raise RuntimeError("Could not configure " + ", ".join(failed))
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import json
+import logging
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Union,
+)
+
+import aiohttp
+from yarl import URL
+
+from cvpibztp.cloudvision import (
+    AUTH_ENDPOINTS,
+    AUTH_ERRORS,
+    CloudVision,
+    CvpAuthError,
+    CvpError,
+    CvpWarning,
+    _configlets_payload,
+    _container_payload,
+    _image_bundle_payload,
+    _move_payload,
+)
+from cvpibztp.paging import DEFAULT_PAGE_SIZE, _records
+from cvpibztp.topology import Topology
+from cvpibztp.upload import CHUNK_SIZE, LogProgress, MultipartFile, Progress
+
+log = logging.getLogger(__name__)
+
+
+async def _stream(body: MultipartFile) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    chunks = iter(body)
+    while (chunk := await loop.run_in_executor(None, next, chunks, None)) is not None:
+        yield chunk
+
+
+async def aiter_pages(
+    fetch: Callable[[int, int], Awaitable[Any]],
+    key: str,
+    page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+    prefetch: Optional[bool] = False,
+) -> AsyncIterator[Any]:
+    """Asynchronous counterpart of :func:`cvpibztp.paging.iter_pages`."""
+    start = 0
+    pending = None
+    try:
+        while True:
+            records = _records(await (pending or fetch(start, start + page_size)), key)
+            pending = None
+            more = len(records) >= page_size
+            start += page_size
+            if more and prefetch:
+                pending = asyncio.ensure_future(fetch(start, start + page_size))
+            for record in records:
+                yield record
+            if not more:
+                return
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+def _reauthenticating(method):
+    @functools.wraps(method)
+    async def wrapper(self, endpoint, *args, **kwargs):
+        generation = self._generation
+        try:
+            return await method(self, endpoint, *args, **kwargs)
+        except CvpAuthError:
+            if endpoint.startswith(AUTH_ENDPOINTS):
+                raise
+            await self._relogin(generation)
+        return await method(self, endpoint, *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncCloudVision(CloudVision):
+    """asyncio client with the CloudVision method surface.
+
+    Use it as ``async with AsyncCloudVision(...) as cvp`` and await every call.
+    One aiohttp connection pool of ``pool_size`` connections is shared by all
+    calls and at most ``concurrency`` requests are in flight at once.
+    """
+
+    def __init__(
+        self,
+        *args,
+        pool_size: Optional[int] = 100,
+        concurrency: Optional[int] = None,
+        cache_topology: Optional[bool] = True,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, pool_size=pool_size, **kwargs)
+        self.pool_size = pool_size
+        self.concurrency = concurrency or pool_size
+        self.cache_topology = cache_topology
+        self._topology: Optional[Topology] = None
+        self._topology_lock: Optional[asyncio.Lock] = None
+
+    def _init_transport(
+        self, pool_size: int, rates: Optional[Dict[str, float]]
+    ) -> None:
+        # The aiohttp session and asyncio locks are created in __aenter__
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._login_lock: Optional[asyncio.Lock] = None
+
+    def __enter__(self):
+        raise TypeError("AsyncCloudVision must be used with 'async with'")
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size, ssl=None if self.verify else False
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=self.timeout, sock_read=self.timeout
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._topology_lock = asyncio.Lock()
+        self._login_lock = asyncio.Lock()
+        try:
+            if self.session_file and (cookies := self.session_file.load()):
+                self.session.cookie_jar.update_cookies(cookies, self._base_url)
+                await self._check_session()
+            else:
+                await self._login()
+        except BaseException:
+            await self.session.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        try:
+            if not self.session_file:
+                await self._logout()
+        finally:
+            await self.session.close()
+            self.metrics.write(self.metrics_path)
+            self.tracer.write()
+
+    @property
+    def _base_url(self) -> URL:
+        return URL(f"{self.scheme}://{self.server}/")
+
+    async def _check_session(self) -> None:
+        await self._get("cvpservice/cvpInfo/getCvpInfo.do")
+
+    @_reauthenticating
+    async def _get(
+        self,
+        endpoint: str,
+        params: Optional[Union[List[str], str]] = [],
+        warnings: Optional[Set[int]] = [],
+        decode: Optional[Callable[[bytes], Any]] = None,
+    ) -> Any:
+        with self.metrics.measure("GET", endpoint) as sample, self.tracer.span(
+            f"GET {endpoint}", cat="http", endpoint=endpoint
+        ):
+            if params:
+                if isinstance(params, list):
+                    params = "&".join(param for param in params if param)
+                endpoint = "?".join([endpoint, params])
+            body = await self._request("GET", endpoint, idempotent=True)
+            sample.size = len(body)
+            return self._decode(body, warnings, decode)
+
+    async def _login(self) -> str:
+        endpoint = "web/login/authenticate.do"
+        payload = {"userId": self.username, "password": self.password}
+        response = await self._post(endpoint, payload=payload, idempotent=True)
+        session_id = response.get("sessionId")
+        if not session_id:
+            log.error(response)
+            raise CvpError(response)
+        self._generation += 1
+        if self.session_file:
+            cookies = self.session.cookie_jar.filter_cookies(self._base_url)
+            self.session_file.save({name: c.value for name, c in cookies.items()})
+
+    async def _logout(self):
+        endpoint = "web/login/logout.do"
+        await self._post(endpoint, idempotent=True)
+
+    @_reauthenticating
+    async def _post(
+        self,
+        endpoint: str,
+        params: Optional[Union[List[str], str]] = "",
+        payload: Optional[Any] = None,
+        warnings: Optional[Set[int]] = {},
+        idempotent: Optional[bool] = False,
+        **kwargs,
+    ) -> Any:
+        with self.metrics.measure("POST", endpoint) as sample, self.tracer.span(
+            f"POST {endpoint}", cat="http", endpoint=endpoint
+        ):
+            if params:
+                if isinstance(params, list):
+                    params = "&".join(param for param in params if param)
+                endpoint = "?".join([endpoint, params])
+            body = await self._request(
+                "POST", endpoint, idempotent=idempotent, json=payload, **kwargs
+            )
+            sample.size = len(body)
+            return self._decode(body, warnings)
+
+    @staticmethod
+    def _decode(
+        body: bytes,
+        warnings: Set[int],
+        decode: Optional[Callable[[bytes], Any]] = None,
+    ) -> Any:
+        data = (decode or json.loads)(body) if body else {}
+        if isinstance(data, dict) and (error_code := data.get("errorCode")):
+            if int(error_code) in AUTH_ERRORS:
+                raise CvpAuthError(data)
+            if int(error_code) in warnings:
+                log.warning(data)
+                raise CvpWarning(data)
+            log.error(data)
+            raise CvpError(data)
+        return data
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        idempotent: bool,
+        data: Optional[Callable[[], Any]] = None,
+        **kwargs,
+    ) -> bytes:
+        url = f"{self.scheme}://{self.server}/{endpoint}"
+        attempts = self.retry.attempts if idempotent else 1
+        for attempt in range(attempts):
+            last = attempt + 1 == attempts
+            try:
+                async with self._semaphore:
+                    async with self.session.request(
+                        method, url, data=data() if data else None, **kwargs
+                    ) as response:
+                        if response.status == 401:
+                            raise CvpAuthError(f"{method} {endpoint} returned 401")
+                        if last or response.status not in self.retry.statuses:
+                            response.raise_for_status()
+                            return await response.read()
+                        retry_after = response.headers.get("Retry-After")
+                        status = response.status
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+                if last:
+                    raise
+                delay = self.retry.delay(attempt)
+                log.warning(
+                    "%s %s failed (%s), retrying in %.1fs", method, endpoint, exc, delay
+                )
+            else:
+                delay = self.retry.delay(attempt, retry_after)
+                log.warning(
+                    "%s %s returned %s, retrying in %.1fs",
+                    method,
+                    endpoint,
+                    status,
+                    delay,
+                )
+            self.metrics.retried(method, endpoint)
+            await asyncio.sleep(delay)
+
+    async def _relogin(self, generation: int) -> None:
+        async with self._login_lock:
+            if generation == self._generation:
+                log.warning("CloudVision session expired, logging in again")
+                self.session.cookie_jar.clear()
+                await self._login()
+
+    async def _add_temp_action(
+        self, payload: Any, warnings: Optional[Set[int]] = {}
+    ) -> Any:
+        response = await self._add_temp_actions([payload], warnings=warnings)
+        if self._topology is not None:
+            self._topology.apply(payload)
+        return response
+
+    async def _save_topology(self, payload: Optional[Any] = []):
+        response = await super()._save_topology(payload)
+        if self._topology is not None:
+            self._topology.saved()
+        return response
+
+    async def _saved(self, response: Any, save: bool) -> Any:
+        response = await response
+        if save:
+            await self._save_topology()
+        return response
+
+    async def add_container(
+        self,
+        container_name: str,
+        to_id: str,
+        to_name: str,
+        info: Optional[str] = None,
+        save: Optional[bool] = False,
+    ):
+        payload = _container_payload(container_name, to_id, to_name, info)
+        warnings = {
+            122518,  # Data already exists in Database
+        }
+        return await self._saved(self._add_temp_action(payload, warnings), save)
+
+    async def add_image(
+        self,
+        image: str,
+        chunk_size: Optional[int] = CHUNK_SIZE,
+        progress: Optional[Progress] = None,
+    ) -> Any:
+        endpoint = "cvpservice/image/addImage.do"
+        warnings = {
+            162876,  # Upload failed: Image with the same name already exists
+        }
+        body = MultipartFile(
+            image, chunk_size=chunk_size, progress=progress or LogProgress(image)
+        )
+        headers = {
+            "Content-Type": body.content_type,
+            "Content-Length": str(len(body)),
+        }
+        # CloudVision answers once it has stored the image; a read timeout
+        # would retry and upload the whole image again
+        return await self._post(
+            endpoint,
+            warnings=warnings,
+            data=lambda: _stream(body),
+            headers=headers,
+            idempotent=True,
+            timeout=aiohttp.ClientTimeout(sock_connect=self.timeout),
+        )
+
+    async def associate_configlets(
+        self,
+        configlets: list,
+        device_name: str,
+        target_ip: Optional[str] = None,
+        save: Optional[bool] = False,
+    ) -> Any:
+        device = await self.get_device_by_name(device_name)
+        payload = _configlets_payload(configlets, device, device_name, target_ip)
+        return await self._saved(self._add_temp_action(payload), save)
+
+    async def associate_image_bundle(
+        self,
+        bundle_id: str,
+        bundle_name: str,
+        to_id_type: str,
+        to_id: str,
+        to_name: str,
+        info: Optional[str] = None,
+        save: Optional[bool] = False,
+    ):
+        payload = _image_bundle_payload(
+            bundle_id, bundle_name, to_id_type, to_id, to_name, info
+        )
+        return await self._saved(self._add_temp_action(payload), save)
+
+    async def get_container_by_name(self, container_name: str) -> str:
+        if self.cache_topology:
+            topology = await self.topology()
+            if container := topology.container(container_name):
+                return container
+        response = await self.search_topology(container_name)
+        if containers := response.get("containerList"):
+            return containers[0]
+
+    async def get_device_by_name(self, device_name: str) -> str:
+        if self.cache_topology:
+            topology = await self.topology()
+            if device := topology.device(device_name):
+                return device
+        response = await self.search_topology(device_name)
+        if devices := response.get("netElementList"):
+            return devices[0]
+
+    async def get_configlets_by_device_name(self, device_name: str) -> Any:
+        if device := await self.get_device_by_name(device_name):
+            device_id = device.get("key")
+            return await self.get_configlets_by_device(net_element_id=device_id)
+
+    async def move_device_to_container(
+        self,
+        container_name: str,
+        device_name: str,
+        save: Optional[bool] = False,
+    ) -> Any:
+        container = await self.get_container_by_name(container_name)
+        if not (device := await self.get_device_by_name(device_name)):
+            return
+
+        payload = _move_payload(container, container_name, device, device_name)
+        warnings = {
+            122518,  # Data already exists in Database
+        }
+        return await self._saved(self._add_temp_action(payload, warnings), save)
+
+    async def refresh_topology(self) -> Topology:
+        self._topology = Topology.from_search(await self.search_topology())
+        return self._topology
+
+    async def topology(self) -> Topology:
+        if self._topology is None:
+            async with self._topology_lock:
+                if self._topology is None:
+                    await self.refresh_topology()
+        return self._topology
+
+    # The inherited iter_* methods return async iterators
+    _pages = staticmethod(aiter_pages)
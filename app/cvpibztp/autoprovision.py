@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from collections import defaultdict
+from functools import partial
+
+from cvpibztp.catalogue import ConfigletCatalogue
+from cvpibztp.checkpoint import (
+    ASSOCIATED,
+    COLLECTED,
+    DONE,
+    FAILED,
+    GENERATED,
+    MOVED,
+    PLANNED,
+    Checkpoint,
+    seed_digest,
+)
+from cvpibztp.cloudvision import CvpError, CvpWarning, action_target
+from cvpibztp.plan import format_plan, plan_device
+from cvpibztp.seed import SeedCache
+from cvpibztp.tasks import format_tasks
+from cvpibztp.watch import AdaptiveInterval, InventoryWatcher
+
+log = logging.getLogger(__name__)
+
+SEED_CONFIGLET = "ztp_seed_data.yaml"
+
+BUILDERS = {
+    "MGMT-ToR": "ztp_l2_domain.py",
+    "MGMT-Spine": "ztp_l2_domain.py",
+}
+
+# Devices per autoConfigletGenerator.do call; a failed call is not retried and
+# fails its whole chunk
+BUILDER_CHUNK = 50
+
+
+def move_device(cvp, plan):
+    with cvp.tracer.span("move", cat="device", serial=plan.device["serialNumber"]):
+        try:
+            cvp.move_device_to_container(plan.move, plan.device.get("fqdn"))
+        except CvpWarning:
+            pass
+
+
+def collect_configlets(cvp, catalogue, plan):
+    with cvp.tracer.span("collect", cat="device", serial=plan.device["serialNumber"]):
+        with cvp.tracer.span("configlet search", cat="device"):
+            ds_configlets = catalogue.for_device(plan.data.get("name"))
+        if not plan.move:
+            missing = set(plan.missing)
+            return plan.assigned + [c for c in ds_configlets if c["name"] in missing]
+
+        device_id = plan.device.get("systemMacAddress")
+        with cvp.tracer.span("temp-config fetch", cat="device"):
+            proposed_configlets = cvp.get_temp_configs_by_net_element_id(device_id).get(
+                "proposedConfiglets"
+            )
+        return proposed_configlets + ds_configlets
+
+
+def generate_configlets(cvp, jobs):
+    """Append builder-generated configlets to each ``(plan, configlets)`` job.
+
+    Devices are grouped by builder so every builder runs once for up to
+    ``BUILDER_CHUNK`` devices. Returns the ``(device, error)`` pairs that could
+    not be generated.
+    """
+    groups = defaultdict(list)
+    for job in jobs:
+        if job[0].builder:
+            groups[job[0].builder].append(job)
+
+    failed = []
+    for builder_name, group in groups.items():
+        try:
+            builder_id = cvp.get_configlet_by_name(builder_name).get("key")
+        except Exception as exc:
+            failed.extend((plan.device, exc) for plan, _ in group)
+            continue
+        for index in range(0, len(group), BUILDER_CHUNK):
+            chunk = group[index : index + BUILDER_CHUNK]
+            failed.extend(_generate_chunk(cvp, builder_name, builder_id, chunk))
+    return failed
+
+
+def _generate_chunk(cvp, builder_name, builder_id, chunk):
+    device_ids = [plan.device.get("systemMacAddress") for plan, _ in chunk]
+    try:
+        with cvp.tracer.span(
+            "builder generation", builder=builder_name, devices=len(chunk)
+        ):
+            response = cvp.auto_configlet_generator(
+                builder_id, net_element_ids=device_ids
+            )
+    except Exception as exc:
+        return [(plan.device, exc) for plan, _ in chunk]
+    failed = []
+    generated = {item.get("netElementId"): item for item in response["data"]}
+    for device_id, (plan, configlets) in zip(device_ids, chunk):
+        if item := generated.get(device_id):
+            configlets.append(item["configlet"])
+        else:
+            error = CvpError(f"{builder_name} generated no configlet for {device_id}")
+            failed.append((plan.device, error))
+    return failed
+
+
+def associate_device(cvp, plan, configlets):
+    log.debug(configlets)
+    with cvp.tracer.span("associate", cat="device", serial=plan.device["serialNumber"]):
+        return cvp.associate_configlets(
+            configlets=configlets,
+            device_name=plan.device.get("fqdn"),
+            target_ip=plan.data.get("ip"),
+            save=True,
+        )
+
+
+def load_seed_data(cvp, seeds=None, name=SEED_CONFIGLET):
+    """Fetch the seed configlet; ``seeds`` skips parsing unchanged content."""
+    with cvp.tracer.span("seed", configlet=name):
+        seed_raw = cvp.get_configlet_by_name(name)
+        return (seeds or SeedCache()).load(name, seed_raw.get("config"))
+
+
+def _serials(plans):
+    return [(plan.device["serialNumber"], None) for plan in plans]
+
+
+def _batch_errors(batch, plans, stage):
+    """``(device, error)`` pairs for the plans whose queued actions failed.
+
+    Warnings CloudVision returned for an action are logged per device.
+    """
+    devices = {plan.device.get("systemMacAddress"): plan.device for plan in plans}
+    for payload, warning in batch.warned:
+        if device := devices.get(action_target(payload)):
+            log.warning("%s %s: %s", stage, device.get("serialNumber"), warning)
+    errors = {}
+    for payload, error in batch.failed:
+        if device := devices.get(action_target(payload)):
+            errors.setdefault(device["serialNumber"], (device, error))
+    return list(errors.values())
+
+
+def provision(
+    cvp, engine, catalogue, seed_data, devices, dry_run=False, checkpoint=None
+):
+    checkpoint = checkpoint or Checkpoint()
+    if not dry_run and (completed := checkpoint.completed()):
+        # Resume an interrupted run without repeating its finished devices
+        pending = [
+            device
+            for device in devices
+            if completed.get(device["serialNumber"])
+            != seed_digest(seed_data.get(device["serialNumber"]))
+        ]
+        log.info("Resuming: %d devices already done", len(devices) - len(pending))
+        devices = pending
+
+    with cvp.tracer.span("plan", devices=len(devices)):
+        planned = engine.run(
+            partial(plan_device, cvp, catalogue, seed_data, BUILDERS), devices
+        )
+    failed = [(outcome.item, outcome.error) for outcome in planned if not outcome.ok]
+    plans = [outcome.result for outcome in planned if outcome.result]
+    unmatched = [
+        outcome.item for outcome in planned if outcome.ok and not outcome.result
+    ]
+    if dry_run:
+        print(format_plan(plans))
+        return [device for device, _ in failed], unmatched, []
+
+    checkpoint.start()
+    try:
+        failed, tasks = _apply(cvp, engine, catalogue, checkpoint, plans, failed)
+    except BaseException:
+        log.error("Run %d interrupted, the next run resumes it", checkpoint.run)
+        raise
+    checkpoint.finish("failed" if failed else "ok", tasks)
+    for device, error in failed:
+        log.error("Provisioning %s failed: %s", device.get("serialNumber"), error)
+    return [device for device, _ in failed], unmatched, tasks
+
+
+def _apply(cvp, engine, catalogue, checkpoint, plans, planning_errors):
+    """Apply the changing plans, recording each stage in ``checkpoint``.
+
+    Returns the ``(device, error)`` failures and the IDs of the saved tasks.
+    """
+    failed = []
+
+    def fail(errors):
+        errors = list(errors)
+        checkpoint.record(
+            FAILED, [(device["serialNumber"], str(error)) for device, error in errors]
+        )
+        failed.extend(errors)
+        return {device["serialNumber"] for device, _ in failed}
+
+    fail(planning_errors)
+    unchanged = [plan for plan in plans if not plan.changes]
+    checkpoint.record(
+        DONE,
+        [(plan.device["serialNumber"], seed_digest(plan.data)) for plan in unchanged],
+    )
+    plans = [plan for plan in plans if plan.changes]
+    checkpoint.record(PLANNED, _serials(plans))
+
+    # Moves are posted before the configlet lookups, which read the
+    # proposed configlets of the device's new container.
+    moves = [plan for plan in plans if plan.move]
+    with cvp.tracer.span("move", devices=len(moves)), cvp.batch(save=False) as batch:
+        moved = engine.run(partial(move_device, cvp), moves)
+    fail((o.item.device, o.error) for o in moved if not o.ok)
+    broken = fail(_batch_errors(batch, moves, "Move"))
+    checkpoint.record(
+        MOVED,
+        _serials(
+            o.item
+            for o in moved
+            if o.ok and o.item.device["serialNumber"] not in broken
+        ),
+    )
+    plans = [plan for plan in plans if plan.device["serialNumber"] not in broken]
+
+    with cvp.tracer.span("collect", devices=len(plans)):
+        collected = engine.run(partial(collect_configlets, cvp, catalogue), plans)
+    jobs = [(outcome.item, outcome.result) for outcome in collected if outcome.ok]
+    fail((o.item.device, o.error) for o in collected if not o.ok)
+    checkpoint.record(COLLECTED, _serials(plan for plan, _ in jobs))
+
+    with cvp.tracer.span("builder generation"):
+        broken = fail(generate_configlets(cvp, jobs))
+    jobs = [job for job in jobs if job[0].device["serialNumber"] not in broken]
+    checkpoint.record(GENERATED, _serials(plan for plan, _ in jobs if plan.builder))
+
+    with cvp.tracer.span("associate", devices=len(jobs)), cvp.batch() as batch:
+        associated = engine.run(lambda args: associate_device(cvp, *args), jobs)
+    fail((o.item[0].device, o.error) for o in associated if not o.ok)
+    broken = fail(_batch_errors(batch, [plan for plan, _ in jobs], "Associate"))
+    done = [
+        o.item[0]
+        for o in associated
+        if o.ok and o.item[0].device["serialNumber"] not in broken
+    ]
+    checkpoint.record(ASSOCIATED, _serials(done))
+    checkpoint.record(
+        DONE, [(plan.device["serialNumber"], seed_digest(plan.data)) for plan in done]
+    )
+    tasks = ((batch.save_response or {}).get("data") or {}).get("taskIds") or []
+    return failed, tasks
+
+
+def settle_tasks(cvp, task_ids, mode="", timeout=None):
+    """Wait for the provisioning tasks, executing them first in "execute" mode.
+
+    Tasks created by other saves, like image bundles, are left alone. Returns
+    the tasks that did not complete.
+    """
+    if not mode:
+        return []
+    cvp.tasks.add(task_ids)
+    if mode == "execute":
+        cvp.tasks.execute()
+    results = cvp.tasks.wait(timeout)
+    print(format_tasks(results))
+    return [result for result in results if not result.ok]
+
+
+def watch(
+    cvp,
+    engine,
+    minimum,
+    maximum,
+    checkpoint=None,
+    tasks=None,
+    seeds=None,
+    seed_configlet=SEED_CONFIGLET,
+):
+    seeds = seeds or SeedCache()
+    watcher = InventoryWatcher(cvp)
+    catalogue = ConfigletCatalogue(cvp)
+    interval = AdaptiveInterval(minimum=minimum, maximum=maximum)
+    while True:
+        devices = []
+        try:
+            if devices := watcher.poll():
+                if watcher.changed:
+                    cvp.refresh_topology()
+                catalogue.refresh()
+                seed_data = load_seed_data(cvp, seeds, seed_configlet)
+                failed, unmatched, task_ids = provision(
+                    cvp, engine, catalogue, seed_data, devices, checkpoint=checkpoint
+                )
+                watcher.retry(failed + unmatched)
+                settle_tasks(cvp, task_ids, **(tasks or {}))
+        except Exception:
+            log.exception("Watch cycle failed")
+            watcher.retry(devices)
+        # The watch only ends by a signal; keep the trace and metrics current
+        cvp.tracer.write()
+        cvp.metrics.write(cvp.metrics_path)
+        delay = interval.next(watcher.changed)
+        log.debug("Next inventory poll in %.0fs", delay)
+        time.sleep(delay)
+
+
+def run(
+    cvp,
+    engine,
+    mode="",
+    checkpoint=None,
+    seeds=None,
+    seed_configlet=SEED_CONFIGLET,
+):
+    """Provision the ZTP devices, or every inventory device in a plan mode.
+
+    Returns the devices that failed and the task IDs of the provisioning save.
+    """
+    devices = cvp.get_inventory(container=None if mode else "undefined_container")
+    catalogue = ConfigletCatalogue(cvp)
+    catalogue.refresh()
+    failed, _, task_ids = provision(
+        cvp,
+        engine,
+        catalogue,
+        load_seed_data(cvp, seeds, seed_configlet),
+        devices,
+        dry_run=mode == "dry-run",
+        checkpoint=checkpoint,
+    )
+    return failed, task_ids
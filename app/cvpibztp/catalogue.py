@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+PAGE_SIZE = 500
+
+
+def device_segments(name: str, prefix: str) -> Iterator[str]:
+    """Yield every device name a ``<prefix><device>_<suffix>`` configlet may target."""
+    if not name.startswith(prefix):
+        return
+    rest = name[len(prefix) :]
+    index = rest.find("_")
+    while index > 0:
+        yield rest[:index]
+        index = rest.find("_", index + 1)
+
+
+class ConfigletCatalogue:
+    """Device-specific configlets indexed by the device name in their name."""
+
+    def __init__(self, cvp, prefix: Optional[str] = "ds_") -> None:
+        self.cvp = cvp
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_device: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def _index(self, configlet: Dict[str, Any]) -> None:
+        for device in device_segments(configlet["name"], self.prefix):
+            self._by_device.setdefault(device, {})[configlet["key"]] = configlet
+
+    def _unindex(self, configlet: Dict[str, Any]) -> None:
+        for device in device_segments(configlet["name"], self.prefix):
+            if entries := self._by_device.get(device):
+                entries.pop(configlet["key"], None)
+                if not entries:
+                    del self._by_device[device]
+
+    def refresh(self) -> Tuple[int, int]:
+        """Re-list the configlets and re-index only the ones that changed.
+
+        Returns the number of added and removed configlets.
+        """
+        current = {}
+        for item in self.cvp.iter_search_configlets(
+            self.prefix, page_size=PAGE_SIZE, prefetch=True
+        ):
+            if item.get("name", "").startswith(self.prefix):
+                current[item["key"]] = {"key": item["key"], "name": item["name"]}
+
+        added = removed = 0
+        with self._lock:
+            for key in list(self._by_key):
+                known = self._by_key[key]
+                if current.get(key, {}).get("name") != known["name"]:
+                    self._unindex(self._by_key.pop(key))
+                    removed += 1
+            for key, configlet in current.items():
+                if key not in self._by_key:
+                    self._by_key[key] = configlet
+                    self._index(configlet)
+                    added += 1
+        log.debug("Configlet catalogue: %d added, %d removed", added, removed)
+        return added, removed
+
+    def for_device(self, device_name: str) -> List[Dict[str, Any]]:
+        entries = self._by_device.get(device_name, {})
+        return sorted(entries.values(), key=lambda configlet: configlet["name"])
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+PLANNED = "planned"
+MOVED = "moved"
+COLLECTED = "collected"
+GENERATED = "generated"
+ASSOCIATED = "associated"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    status TEXT,
+    tasks TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs (id),
+    serial TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    detail TEXT,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS devices (
+    serial TEXT PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs (id),
+    stage TEXT NOT NULL,
+    detail TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_run ON events (run, serial);
+"""
+
+
+def seed_digest(data: Optional[Dict[str, Any]]) -> str:
+    encoded = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class Checkpoint:
+    """Provisioning progress per device in a SQLite database.
+
+    Every stage a device passes is appended to ``events`` and its latest
+    stage is kept in ``devices``. When the previous run never finished, the
+    devices it completed are skipped while their seed entry is unchanged.
+
+    Only ``DONE``, recorded once the associate save went through, is used to
+    resume. The other stages are kept for ``status`` and diagnosis. Moves
+    stay temp actions until that same save, so a device interrupted before
+    ``DONE`` has nothing saved. It is planned and queued again from its live
+    state, which is also why temp-action IDs are not stored.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.run: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def start(self) -> int:
+        with self._lock, self.db:
+            cursor = self.db.execute(
+                "INSERT INTO runs (started) VALUES (?)", (time.time(),)
+            )
+        self.run = cursor.lastrowid
+        return self.run
+
+    def finish(self, status: str, tasks: Iterable[str] = ()) -> None:
+        with self._lock, self.db:
+            self.db.execute(
+                "UPDATE runs SET finished = ?, status = ?, tasks = ? WHERE id = ?",
+                (time.time(), status, json.dumps(list(tasks)), self.run),
+            )
+
+    def record(self, stage: str, entries: Iterable[Tuple[str, Optional[str]]]) -> None:
+        """Move devices to ``stage``; ``entries`` are ``(serial, detail)`` pairs."""
+        now = time.time()
+        rows = [(self.run, serial, stage, detail, now) for serial, detail in entries]
+        if not rows:
+            return
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT INTO events (run, serial, stage, detail, at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO devices (run, serial, stage, detail, updated)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def completed(self) -> Dict[str, str]:
+        """Seed digests of the devices done since the last finished run."""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT serial, detail FROM devices WHERE stage = ? AND run > ("
+                " SELECT coalesce(max(id), 0) FROM runs WHERE finished IS NOT NULL)",
+                (DONE,),
+            ).fetchall()
+        return dict(rows)
+
+    def runs(self, limit: Optional[int] = 10) -> List[Tuple]:
+        with self._lock:
+            return self.db.execute(
+                "SELECT id, started, finished, status, tasks FROM runs"
+                " ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def stages(self, run: int) -> List[Tuple]:
+        """Latest ``(serial, stage, detail)`` of every device seen in ``run``."""
+        with self._lock:
+            return self.db.execute(
+                "SELECT serial, stage, detail FROM events WHERE id IN ("
+                " SELECT max(id) FROM events WHERE run = ? GROUP BY serial)"
+                " ORDER BY serial",
+                (run,),
+            ).fetchall()
+
+
+def format_runs(checkpoint: Checkpoint, limit: Optional[int] = 10) -> str:
+    lines = []
+    for run, started, _, status, tasks in checkpoint.runs(limit):
+        stages = checkpoint.stages(run)
+        counts = Counter(stage for _, stage, _ in stages)
+        summary = ", ".join(f"{count} {stage}" for stage, count in counts.items())
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started))
+        lines.append(
+            f"run {run} started {started}: {status or 'unfinished'}, "
+            f"{len(json.loads(tasks or '[]'))} tasks, {summary or 'no devices'}"
+        )
+        lines.extend(
+            f"  {serial} failed: {detail}"
+            for serial, stage, detail in stages
+            if stage == FAILED
+        )
+    return "\n".join(lines)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""python -m cvpibztp {upload,provision,run-all,watch}"""
+
+import argparse
+import logging
+import signal
+import sys
+import time
+from pathlib import Path
+
+STARTED = time.perf_counter()
+
+log = logging.getLogger(__name__)
+
+
+# Stage modules are imported on demand so ``--help`` and argument errors
+# return before requests and the client are loaded.
+
+
+def _engine():
+    from cvpibztp.common import worker_count
+    from cvpibztp.engine import Engine
+
+    return Engine(workers=worker_count())
+
+
+def _checkpoint():
+    from cvpibztp.checkpoint import Checkpoint
+    from cvpibztp.common import checkpoint_path
+
+    return Checkpoint(checkpoint_path())
+
+
+def _seeds():
+    from cvpibztp.common import seed_settings
+    from cvpibztp.seed import SeedCache
+
+    settings = seed_settings()
+    return {
+        "seeds": SeedCache(settings["cache_path"]),
+        "seed_configlet": settings["configlet"],
+    }
+
+
+def _upload(cvp, args) -> bool:
+    from cvpibztp.common import worker_count
+    from cvpibztp.uploader import upload
+
+    return upload(cvp, workers=worker_count(), configlets=args.configlets)
+
+
+def _provision(cvp, args) -> bool:
+    from cvpibztp.autoprovision import run, settle_tasks
+    from cvpibztp.common import plan_mode, task_settings
+
+    mode = args.plan or plan_mode()
+    failed, task_ids = run(
+        cvp, _engine(), mode=mode, checkpoint=_checkpoint(), **_seeds()
+    )
+    if mode == "dry-run":
+        return not failed
+    return not settle_tasks(cvp, task_ids, **task_settings()) and not failed
+
+
+def _watch(cvp, args) -> bool:
+    from cvpibztp.autoprovision import watch
+    from cvpibztp.common import task_settings, watch_settings
+
+    settings = watch_settings()
+    watch(
+        cvp,
+        _engine(),
+        settings["minimum"],
+        settings["maximum"],
+        checkpoint=_checkpoint(),
+        tasks=task_settings(),
+        **_seeds(),
+    )
+
+
+def _run_all(cvp, args) -> bool:
+    from cvpibztp.common import watch_settings
+
+    if not _upload(cvp, args):
+        return False
+    if watch_settings()["enabled"]:
+        return _watch(cvp, args)
+    return _provision(cvp, args)
+
+
+def _status(cvp, args) -> bool:
+    from cvpibztp.checkpoint import format_runs
+
+    print(format_runs(_checkpoint(), limit=args.runs))
+    return True
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cvpibztp", description=__doc__)
+    parser.add_argument("--log-level", default="DEBUG")
+    parser.set_defaults(client=True)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upload = argparse.ArgumentParser(add_help=False)
+    upload.add_argument("--configlets", type=Path, help="configlet directory")
+    provision = argparse.ArgumentParser(add_help=False)
+    provision.add_argument(
+        "--plan",
+        choices=("dry-run", "apply"),
+        help="diff every inventory device against the seed (CVPIBZTP_PLAN)",
+    )
+
+    command = commands.add_parser(
+        "upload", parents=[upload], help="push images, containers and configlets"
+    )
+    command.set_defaults(func=_upload)
+    command = commands.add_parser(
+        "provision", parents=[provision], help="provision devices waiting for ZTP"
+    )
+    command.set_defaults(func=_provision)
+    command = commands.add_parser(
+        "run-all",
+        parents=[upload, provision],
+        help="upload, then provision (or watch with CVPIBZTP_WATCH)",
+    )
+    command.set_defaults(func=_run_all)
+    command = commands.add_parser("watch", help="provision devices as they appear")
+    command.set_defaults(func=_watch)
+    command = commands.add_parser(
+        "status", help="show recent runs from the checkpoint (CVPIBZTP_CHECKPOINT)"
+    )
+    command.add_argument("--runs", type=int, default=10, help="number of runs")
+    command.set_defaults(func=_status, client=False)
+    return parser
+
+
+def _terminate(signum, frame) -> None:
+    # docker stop sends SIGTERM; leave through the client's __exit__ so the
+    # trace and metrics are written
+    sys.exit(128 + signum)
+
+
+def main(argv=None) -> None:
+    args = parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    if not args.client:
+        args.func(None, args)
+        return
+
+    from cvpibztp.cloudvision import ConvCloudVision
+    from cvpibztp.common import connection_details
+
+    signal.signal(signal.SIGTERM, _terminate)
+    with ConvCloudVision(**connection_details()) as cvp:
+        log.info("Started in %.0f ms", (time.perf_counter() - STARTED) * 1000)
+        ok = args.func(cvp, args)
+    if not ok:
+        sys.exit(1)
@@ -1,10 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import functools
 import logging
-from typing import Any, List, Optional, Set, Union
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import requests
 
+from cvpibztp.engine import Engine
+from cvpibztp.images import DigestCache, image_matches
+from cvpibztp.inventory import DeviceRecord, inventory_decoder
+from cvpibztp.limiter import Limiter
+from cvpibztp.metrics import Metrics
+from cvpibztp.paging import DEFAULT_PAGE_SIZE, iter_pages
+from cvpibztp.session import SessionFile
+from cvpibztp.tasks import TaskMonitor
+from cvpibztp.topology import Topology
+from cvpibztp.tracing import Tracer
+from cvpibztp.transport import RetryPolicy, make_session
+from cvpibztp.upload import CHUNK_SIZE, LogProgress, MultipartFile, Progress
+
 log = logging.getLogger(__name__)
 
 
@@ -16,6 +33,143 @@ class CvpWarning(RuntimeWarning):
     pass
 
 
+class CvpAuthError(CvpError):
+    pass
+
+
+AUTH_ENDPOINTS = ("web/login/authenticate.do", "web/login/logout.do")
+AUTH_ERRORS = {
+    112498,  # Unauthorized User
+}
+
+
+def _reauthenticating(method):
+    """Log in again and replay the call once when the session has expired."""
+
+    @functools.wraps(method)
+    def wrapper(self, endpoint, *args, **kwargs):
+        generation = self._generation
+        try:
+            return method(self, endpoint, *args, **kwargs)
+        except CvpAuthError:
+            if endpoint.startswith(AUTH_ENDPOINTS):
+                raise
+            self._relogin(generation)
+        return method(self, endpoint, *args, **kwargs)
+
+    return wrapper
+
+
+def _configlets_payload(
+    configlets: list, device: Any, device_name: str, target_ip: Optional[str]
+) -> Any:
+    device_id = device.get("key")
+    device_ip = device.get("ipAddress")
+
+    configlet_names = []
+    configlet_keys = []
+    for configlet in configlets:
+        configlet_names.append(configlet["name"])
+        configlet_keys.append(configlet["key"])
+
+    info = f"Assign configlets to {device_name}"
+    return {
+        "info": info,
+        "infoPreview": info,
+        "note": "",
+        "action": "associate",
+        "nodeType": "configlet",
+        "nodeId": "",
+        "configletList": configlet_keys,
+        "configletNamesList": configlet_names,
+        "ignoreConfigletNamesList": [],
+        "ignoreConfigletList": [],
+        "configletBuilderList": [],
+        "configletBuilderNamesList": [],
+        "ignoreConfigletBuilderList": [],
+        "ignoreConfigletBuilderNamesList": [],
+        "toId": device_id,
+        "toIdType": "netelement",
+        "fromId": "",
+        "nodeName": "",
+        "fromName": "",
+        "toName": device_name,
+        "nodeIpAddress": device_ip,
+        "nodeTargetIpAddress": target_ip or device_ip,
+        "childTasks": [],
+        "parentTask": "",
+    }
+
+
+def _container_payload(
+    container_name: str, to_id: str, to_name: str, info: Optional[str]
+) -> Any:
+    return {
+        "info": info,
+        "infoPreview": info,
+        "note": "",
+        "action": "add",
+        "nodeType": "container",
+        "nodeId": container_name,
+        "toId": to_id,
+        "toIdType": "container",
+        "fromId": "",
+        "nodeName": container_name,
+        "fromName": "",
+        "toName": to_name,
+        "childTasks": [],
+        "parentTask": "",
+    }
+
+
+def _image_bundle_payload(
+    bundle_id: str,
+    bundle_name: str,
+    to_id_type: str,
+    to_id: str,
+    to_name: str,
+    info: Optional[str],
+) -> Any:
+    return {
+        "info": info,
+        "infoPreview": info,
+        "note": "",
+        "action": "associate",
+        "nodeType": "imagebundle",
+        "nodeId": bundle_id,
+        "toId": to_id,
+        "toIdType": to_id_type,
+        "fromId": "",
+        "nodeName": bundle_name,
+        "fromName": "",
+        "toName": to_name,
+        "childTasks": [],
+        "parentTask": "",
+    }
+
+
+def _move_payload(
+    container: Any, container_name: str, device: Any, device_name: str
+) -> Any:
+    device_id = device.get("key")
+    from_container_id = device.get("parentContainerId")
+    to_container_id = container.get("key")
+
+    info = f"Move {device_name} to {container_name}"
+    return {
+        "info": info,
+        "infoPreview": info,
+        "action": "update",
+        "nodeType": "netelement",
+        "nodeId": device_id,
+        "toId": to_container_id,
+        "fromId": from_container_id,
+        "nodeName": device_name,
+        "toName": container_name,
+        "toIdType": "container",
+    }
+
+
 class CloudVision:
     def __init__(
         self,
@@ -24,8 +178,16 @@ class CloudVision:
         password: str,
         timeout: Optional[int] = None,
         verify: Optional[bool] = True,
+        scheme: Optional[str] = "https",
+        pool_size: Optional[int] = 10,
+        retry: Optional[RetryPolicy] = None,
+        metrics_path: Optional[str] = None,
+        session_file: Optional[str] = None,
+        rates: Optional[Dict[str, float]] = None,
+        trace_path: Optional[str] = None,
     ) -> None:
         self.server = server
+        self.scheme = scheme
         self.username = username
         self.password = password
 
@@ -36,51 +198,91 @@ class CloudVision:
 
             urllib3.disable_warnings()
 
-        self.session = requests.Session()
+        self.retry = retry or RetryPolicy()
+        self.metrics = Metrics()
+        self.metrics_path = metrics_path
+        self.tracer = Tracer(trace_path)
+        self.session_file = (
+            SessionFile(session_file, server, username) if session_file else None
+        )
+        self._generation = 0
+        self._init_transport(pool_size, rates)
+
+    def _init_transport(
+        self, pool_size: int, rates: Optional[Dict[str, float]]
+    ) -> None:
+        self.session = make_session(pool_size=pool_size)
+        self.limiter = Limiter(concurrency=pool_size, rates=rates)
+        self._login_lock = threading.Lock()
 
     def __delete__(self):
         self._logout()
 
     def __enter__(self):
-        self._login()
+        if self.session_file and (cookies := self.session_file.load()):
+            self.session.cookies.update(cookies)
+            self._check_session()
+        else:
+            self._login()
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self._logout()
+        try:
+            # A saved session stays valid for the next process
+            if not self.session_file:
+                self._logout()
+        finally:
+            self.metrics.write(self.metrics_path)
+            self.tracer.write()
 
     def _add_temp_action(self, payload: Any, warnings: Optional[Set[int]] = {}) -> Any:
+        return self._add_temp_actions([payload], warnings=warnings)
+
+    def _add_temp_actions(
+        self, payloads: List[Any], warnings: Optional[Set[int]] = {}
+    ) -> Any:
         endpoint = "cvpservice/ztp/addTempAction.do"
         params = ["format=topology", "queryParam", "nodeId=root"]
         return self._post(
             endpoint,
             params=params,
-            payload={"data": [payload]},
+            payload={"data": payloads},
             warnings=warnings,
         )
 
+    def _check_session(self) -> None:
+        self._get("cvpservice/cvpInfo/getCvpInfo.do")
+
+    @_reauthenticating
     def _get(
         self,
         endpoint: str,
         params: Optional[Union[List[str], str]] = [],
         warnings: Optional[Set[int]] = [],
+        decode: Optional[Callable[[bytes], Any]] = None,
     ) -> Any:
-        if params:
-            if isinstance(params, list):
-                params = "&".join(param for param in params if param)
-            endpoint = "?".join([endpoint, params])
-        response = self.session.get(f"https://{self.server}/{endpoint}")
-        response.raise_for_status()
-        json = response.json()
-        try:
-            if error_code := json.get("errorCode"):
-                if int(error_code) not in warnings:
-                    raise CvpError(json)
-                else:
-                    log.warning(json)
-                    raise CvpWarning(json)
-        except AttributeError:
+        with self.metrics.measure("GET", endpoint) as sample, self.tracer.span(
+            f"GET {endpoint}", cat="http", endpoint=endpoint
+        ):
+            if params:
+                if isinstance(params, list):
+                    params = "&".join(param for param in params if param)
+                endpoint = "?".join([endpoint, params])
+            response = self._request("GET", endpoint, idempotent=True)
+            sample.size = len(response.content)
+            json = decode(response.content) if decode else response.json()
+            try:
+                if error_code := json.get("errorCode"):
+                    if int(error_code) in AUTH_ERRORS:
+                        raise CvpAuthError(json)
+                    if int(error_code) not in warnings:
+                        raise CvpError(json)
+                    else:
+                        log.warning(json)
+                        raise CvpWarning(json)
+            except AttributeError:
+                return json
             return json
-        return json
 
     def _login(self) -> str:
         endpoint = "web/login/authenticate.do"
@@ -89,45 +291,100 @@ class CloudVision:
             "Accept": "application/json",
             "Content-Type": "application/json",
         }
-        response = self._post(endpoint, payload=payload, headers=headers)
+        response = self._post(
+            endpoint, payload=payload, headers=headers, idempotent=True
+        )
         session_id = response.get("sessionId")
         if not session_id:
             log.error(response)
             raise CvpError(response)
+        self._generation += 1
+        if self.session_file:
+            self.session_file.save(self.session.cookies.get_dict())
 
     def _logout(self):
         endpoint = "web/login/logout.do"
-        self._post(endpoint)
+        self._post(endpoint, idempotent=True)
 
+    @_reauthenticating
     def _post(
         self,
         endpoint: str,
         params: Optional[Union[List[str], str]] = "",
         payload: Optional[Any] = None,
         warnings: Optional[Set[int]] = {},
+        idempotent: Optional[bool] = False,
         **kwargs,
     ) -> Any:
-        if params:
-            if isinstance(params, list):
-                params = "&".join(param for param in params if param)
-            endpoint = "?".join([endpoint, params])
-        response = self.session.post(
-            f"https://{self.server}/{endpoint}",
-            json=payload,
-            timeout=self.timeout,
-            verify=self.verify,
-            **kwargs,
-        )
-        response.raise_for_status()
-        json = response.json()
-        if error_code := json.get("errorCode"):
-            if int(error_code) in warnings:
-                log.warning(json)
-                raise CvpWarning(json)
+        with self.metrics.measure("POST", endpoint) as sample, self.tracer.span(
+            f"POST {endpoint}", cat="http", endpoint=endpoint
+        ):
+            if params:
+                if isinstance(params, list):
+                    params = "&".join(param for param in params if param)
+                endpoint = "?".join([endpoint, params])
+            response = self._request(
+                "POST", endpoint, idempotent=idempotent, json=payload, **kwargs
+            )
+            sample.size = len(response.content)
+            json = response.json()
+            if error_code := json.get("errorCode"):
+                if int(error_code) in AUTH_ERRORS:
+                    raise CvpAuthError(json)
+                if int(error_code) in warnings:
+                    log.warning(json)
+                    raise CvpWarning(json)
+                else:
+                    log.error(json)
+                    raise CvpError(json)
+            return json
+
+    def _request(
+        self, method: str, endpoint: str, idempotent: bool, **kwargs
+    ) -> requests.Response:
+        url = f"{self.scheme}://{self.server}/{endpoint}"
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = self.retry.attempts if idempotent else 1
+        for attempt in range(attempts):
+            last = attempt + 1 == attempts
+            try:
+                with self.limiter.permit(endpoint) as permit:
+                    response = self.session.request(
+                        method, url, verify=self.verify, **kwargs
+                    )
+                    permit.overloaded = response.status_code in self.retry.statuses
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if last:
+                    raise
+                delay = self.retry.delay(attempt)
+                self.metrics.retried(method, endpoint)
+                log.warning(
+                    "%s %s failed (%s), retrying in %.1fs", method, endpoint, exc, delay
+                )
             else:
-                log.error(json)
-                raise CvpError(json)
-        return json
+                if response.status_code == 401:
+                    raise CvpAuthError(f"{method} {endpoint} returned 401")
+                if last or response.status_code not in self.retry.statuses:
+                    response.raise_for_status()
+                    return response
+                delay = self.retry.delay(attempt, response.headers.get("Retry-After"))
+                self.metrics.retried(method, endpoint)
+                log.warning(
+                    "%s %s returned %s, retrying in %.1fs",
+                    method,
+                    endpoint,
+                    response.status_code,
+                    delay,
+                )
+            time.sleep(delay)
+
+    def _relogin(self, generation: int) -> None:
+        with self._login_lock:
+            # Threads that failed on the same session share one login
+            if generation == self._generation:
+                log.warning("CloudVision session expired, logging in again")
+                self.session.cookies.clear()
+                self._login()
 
     def _save_topology(self, payload: Optional[Any] = []):
         endpoint = "cvpservice/provisioning/v2/saveTopology.do"
@@ -158,22 +415,7 @@ class CloudVision:
         info: Optional[str] = None,
         save: Optional[bool] = False,
     ):
-        payload = {
-            "info": info,
-            "infoPreview": info,
-            "note": "",
-            "action": "add",
-            "nodeType": "container",
-            "nodeId": container_name,
-            "toId": to_id,
-            "toIdType": "container",
-            "fromId": "",
-            "nodeName": container_name,
-            "fromName": "",
-            "toName": to_name,
-            "childTasks": [],
-            "parentTask": "",
-        }
+        payload = _container_payload(container_name, to_id, to_name, info)
         warnings = {
             122518,  # Data already exists in Database
         }
@@ -182,14 +424,30 @@ class CloudVision:
             self._save_topology()
         return response
 
-    def add_image(self, image: str) -> Any:
-        with open(image, "rb") as io:
-            endpoint = "cvpservice/image/addImage.do"
-            warnings = {
-                162876,  # Upload failed: Image with the same name already exists
-            }
-            files = {"file": io}
-            return self._post(endpoint, warnings=warnings, files=files)
+    def add_image(
+        self,
+        image: str,
+        chunk_size: Optional[int] = CHUNK_SIZE,
+        progress: Optional[Progress] = None,
+    ) -> Any:
+        endpoint = "cvpservice/image/addImage.do"
+        warnings = {
+            162876,  # Upload failed: Image with the same name already exists
+        }
+        body = MultipartFile(
+            image, chunk_size=chunk_size, progress=progress or LogProgress(image)
+        )
+        headers = {"Content-Type": body.content_type}
+        # CloudVision answers once it has stored the image; a read timeout
+        # would retry and upload the whole image again
+        return self._post(
+            endpoint,
+            warnings=warnings,
+            data=body,
+            headers=headers,
+            idempotent=True,
+            timeout=(self.timeout, None),
+        )
 
     def associate_image_bundle(
         self,
@@ -201,22 +459,9 @@ class CloudVision:
         info: Optional[str] = None,
         save: Optional[bool] = False,
     ):
-        payload = {
-            "info": info,
-            "infoPreview": info,
-            "note": "",
-            "action": "associate",
-            "nodeType": "imagebundle",
-            "nodeId": bundle_id,
-            "toId": to_id,
-            "toIdType": to_id_type,
-            "fromId": "",
-            "nodeName": bundle_name,
-            "fromName": "",
-            "toName": to_name,
-            "childTasks": [],
-            "parentTask": "",
-        }
+        payload = _image_bundle_payload(
+            bundle_id, bundle_name, to_id_type, to_id, to_name, info
+        )
         response = self._add_temp_action(payload)
         if save:
             self._save_topology()
@@ -235,13 +480,43 @@ class CloudVision:
             "containerId": container_id or "",
             "pageType": "container",
         }
-        return self._post(endpoint, payload=payload)
+        # The builder runs once per device and the request is not retried,
+        # wait for it however long the script takes
+        return self._post(endpoint, payload=payload, timeout=(self.timeout, None))
+
+    def delete_all_temp_actions(self) -> Any:
+        endpoint = "cvpservice/provisioning/deleteAllTempAction.do"
+        return self._get(endpoint)
+
+    def execute_tasks(self, task_ids: List[str]) -> Any:
+        endpoint = "cvpservice/task/executeTask.do"
+        payload = {"data": list(task_ids)}
+        return self._post(endpoint, payload=payload, idempotent=True)
+
+    def get_configlet_builder(self, key: str) -> Any:
+        endpoint = "cvpservice/configlet/getConfigletBuilder.do"
+        params = ["type=", f"id={key}"]
+        return self._get(endpoint, params=params)
 
     def get_configlet_by_name(self, name: str) -> Any:
         endpoint = "cvpservice/configlet/getConfigletByName.do"
         params = f"name={name or ''}"
         return self._get(endpoint, params=params)
 
+    def get_configlets(
+        self,
+        configlet_type: Optional[str] = "Configlet",
+        start: Optional[int] = 0,
+        end: Optional[int] = 0,
+    ) -> Any:
+        endpoint = "cvpservice/configlet/getConfiglets.do"
+        params = [
+            f"type={configlet_type}",
+            f"startIndex={start}",
+            f"endIndex={end}",
+        ]
+        return self._get(endpoint, params=params)
+
     def get_configlets_by_device(
         self,
         net_element_id: str,
@@ -292,10 +567,114 @@ class CloudVision:
         ]
         return self._get(endpoint, params=params)
 
+    def get_inventory(self, container: Optional[str] = None) -> List[DeviceRecord]:
+        endpoint = "cvpservice/inventory/devices"
+        return self._get(endpoint, decode=inventory_decoder(container))
+
     def get_inventory_devices(self):
         endpoint = "cvpservice/inventory/devices"
         return self._get(endpoint)
 
+    def iter_configlets(
+        self,
+        configlet_type: Optional[str] = "Configlet",
+        page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        prefetch: Optional[bool] = False,
+    ) -> Iterator[Any]:
+        def fetch(start, end):
+            return self.get_configlets(configlet_type, start=start, end=end)
+
+        return self._pages(fetch, "data", page_size, prefetch)
+
+    def iter_configlets_by_device(
+        self,
+        net_element_id: str,
+        page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        prefetch: Optional[bool] = False,
+    ) -> Iterator[Any]:
+        def fetch(start, end):
+            return self.get_configlets_by_device(net_element_id, start=start, end=end)
+
+        return self._pages(fetch, "configletList", page_size, prefetch)
+
+    def iter_image_bundles(
+        self,
+        query: Optional[str] = None,
+        page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        prefetch: Optional[bool] = False,
+    ) -> Iterator[Any]:
+        def fetch(start, end):
+            return self.get_image_bundles(query=query, start=start, end=end)
+
+        return self._pages(fetch, "data", page_size, prefetch)
+
+    def iter_images(
+        self,
+        query: Optional[str] = None,
+        page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        prefetch: Optional[bool] = False,
+    ) -> Iterator[Any]:
+        def fetch(start, end):
+            return self.get_images(query=query, start=start, end=end)
+
+        return self._pages(fetch, "data", page_size, prefetch)
+
+    def iter_search_configlets(
+        self,
+        query: str,
+        page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        prefetch: Optional[bool] = False,
+    ) -> Iterator[Any]:
+        def fetch(start, end):
+            return self.search_configlets(query, start=start, end=end)
+
+        return self._pages(fetch, "data", page_size, prefetch)
+
+    def iter_search_topology(
+        self,
+        query: Optional[str] = None,
+        key: Optional[str] = "netElementList",
+        page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        prefetch: Optional[bool] = False,
+    ) -> Iterator[Any]:
+        def fetch(start, end):
+            return self.search_topology(query, start=start, end=end)
+
+        return self._pages(fetch, key, page_size, prefetch)
+
+    def iter_tasks(
+        self,
+        query: Optional[str] = None,
+        page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        prefetch: Optional[bool] = False,
+    ) -> Iterator[Any]:
+        def fetch(start, end):
+            return self.get_tasks(query=query, start=start, end=end)
+
+        return self._pages(fetch, "data", page_size, prefetch)
+
+    # Every iter_* method pages through this hook
+    _pages = staticmethod(iter_pages)
+
+    def get_task_by_id(self, task_id: str) -> Any:
+        endpoint = "cvpservice/task/getTaskById.do"
+        params = f"taskId={task_id}"
+        return self._get(endpoint, params=params)
+
+    def get_tasks(
+        self,
+        query: Optional[str] = None,
+        start: Optional[int] = 0,
+        end: Optional[int] = 0,
+    ) -> Any:
+        endpoint = "cvpservice/task/getTasks.do"
+        params = [
+            f"queryparam={query or ''}",
+            f"startIndex={start}",
+            f"endIndex={end}",
+        ]
+        return self._get(endpoint, params=params)
+
     def get_temp_configs_by_net_element_id(self, net_element_id: str) -> Any:
         endpoint = "cvpservice/provisioning/getTempConfigsByNetElementId.do"
         params = f"netElementId={net_element_id or ''}"
@@ -344,6 +723,27 @@ class CloudVision:
         ]
         return self._get(endpoint, params=params)
 
+    def update_configlet(self, key: str, data: str, name: str) -> Any:
+        endpoint = "cvpservice/configlet/updateConfiglet.do"
+        payload = {
+            "config": data,
+            "key": key,
+            "name": name,
+            "reconciled": False,
+            "waitForTaskIds": False,
+        }
+        return self._post(endpoint, payload=payload, idempotent=True)
+
+    def update_configlet_builder(self, key: str, data: str, name: str) -> Any:
+        endpoint = "cvpservice/configlet/updateConfigletBuilder.do"
+        params = ["isDraft=false", f"id={key}", "action=save"]
+        payload = {
+            "name": name,
+            "waitForTaskIds": False,
+            "data": {"main_script": {"data": data}},
+        }
+        return self._post(endpoint, params=params, payload=payload, idempotent=True)
+
     # def update_netelement(
     #     self,
     #     from_id: str,
@@ -373,21 +773,189 @@ class CloudVision:
     #     return response
 
 
+def action_target(payload: Any) -> Optional[str]:
+    """Key of the device a topology temp action applies to."""
+    if payload.get("nodeType") == "netelement":
+        return payload.get("nodeId")
+    return payload.get("toId")
+
+
+class TopologyBatch:
+    def __init__(self, save: bool) -> None:
+        self.save = save
+        self.actions: List[Any] = []
+        self.warnings: Set[int] = set()
+        self.responses: List[Any] = []
+        self.save_response: Any = None
+        # (payload, exception) of the actions that were not committed
+        self.failed: List[Tuple[Any, Exception]] = []
+        self.warned: List[Tuple[Any, CvpWarning]] = []
+
+
 class ConvCloudVision(CloudVision):
-    def _get_or_add_image(self, image_name: str) -> Any:
-        response = self.get_images(query=image_name)
-        if response.get("total", 0) > 0:
-            image_data = next(
-                (
-                    image
-                    for image in response.get("data", [])
-                    if image.get("name") == image_name
-                ),
-                None,
+    def __init__(
+        self,
+        *args,
+        batch_size: Optional[int] = 100,
+        cache_topology: Optional[bool] = True,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.batch_size = batch_size
+        self.cache_topology = cache_topology
+        self._batch: Optional[TopologyBatch] = None
+        self._batch_lock = threading.RLock()
+        self._topology: Optional[Topology] = None
+        self._topology_lock = threading.Lock()
+        self.tasks = TaskMonitor(self)
+
+    def _add_temp_action(self, payload: Any, warnings: Optional[Set[int]] = {}) -> Any:
+        with self._batch_lock:
+            if batched := self._batch is not None:
+                self._batch.actions.append(payload)
+                self._batch.warnings.update(warnings)
+        response = None
+        if not batched:
+            response = super()._add_temp_action(payload, warnings=warnings)
+        if self._topology is not None:
+            self._topology.apply(payload)
+        return response
+
+    def _save_topology(self, payload: Optional[Any] = []):
+        with self._batch_lock:
+            if self._batch is not None:
+                self._batch.save = True
+                return None
+        response = super()._save_topology(payload)
+        if self._topology is not None:
+            self._topology.saved()
+        return response
+
+    @property
+    def topology(self) -> Topology:
+        if self._topology is None:
+            with self._topology_lock:
+                if self._topology is None:
+                    self._topology = Topology.from_search(self.search_topology())
+        return self._topology
+
+    def refresh_topology(self) -> Topology:
+        with self._topology_lock:
+            self._topology = Topology.from_search(self.search_topology())
+        return self._topology
+
+    def _post_chunk(self, batch: TopologyBatch, chunk: List[Any]) -> None:
+        try:
+            batch.responses.append(
+                self._add_temp_actions(chunk, warnings=batch.warnings)
             )
-            if image_data:
-                return image_data
-        return self.add_image(image_name)
+            return
+        except CvpWarning as warning:
+            if len(chunk) == 1:
+                batch.warned.append((chunk[0], warning))
+                batch.responses.append(warning.args[0])
+                return
+            log.warning("Posting %d actions one at a time", len(chunk))
+        except (CvpError, requests.HTTPError) as exc:
+            if len(chunk) == 1:
+                batch.failed.append((chunk[0], exc))
+                return
+            log.warning(
+                "%d actions failed (%s), posting one at a time", len(chunk), exc
+            )
+        for payload in chunk:
+            self._post_chunk(batch, [payload])
+
+    def _cancel_batch(self, batch: TopologyBatch, error: Exception) -> None:
+        """Drop the batch's pending temp actions so no later save commits them."""
+        failed = {id(payload) for payload, _ in batch.failed}
+        batch.failed.extend(
+            (payload, error) for payload in batch.actions if id(payload) not in failed
+        )
+        batch.save_response = None
+        try:
+            self.delete_all_temp_actions()
+        except (CvpError, requests.RequestException) as exc:
+            log.error("Could not cancel the pending temp actions: %s", exc)
+        self._forget_topology()
+
+    def _forget_topology(self) -> None:
+        # Queued actions are applied to the cached topology right away, so
+        # later actions of the batch see them; one that failed must not stay
+        with self._topology_lock:
+            self._topology = None
+
+    def _flush_batch(self, batch: TopologyBatch) -> None:
+        """Post the queued actions in chunks and save them.
+
+        A chunk CloudVision rejects is posted again one action at a time, so
+        only the actions that fail on their own are dropped; the accepted
+        ones are saved. When a chunk may have been applied partially (the
+        connection failed) or the save fails, every pending temp action is
+        deleted and the whole batch reported as failed. Any failure drops the
+        cached topology, which already reflects every queued action.
+        """
+        size = self.batch_size or len(batch.actions) or 1
+        with self.tracer.span("save", actions=len(batch.actions)):
+            try:
+                for index in range(0, len(batch.actions), size):
+                    self._post_chunk(batch, batch.actions[index : index + size])
+                if batch.failed:
+                    self._forget_topology()
+                if batch.save and len(batch.failed) < len(batch.actions):
+                    batch.save_response = self._save_topology()
+            except (CvpError, requests.RequestException) as exc:
+                log.error("Topology batch cancelled: %s", exc)
+                self._cancel_batch(batch, exc)
+
+    @contextmanager
+    def batch(self, save: Optional[bool] = True) -> Iterator[TopologyBatch]:
+        """Queue topology actions and post them in chunks when the block exits.
+
+        Actions from all threads are collected while the block is open and
+        committed with a single saveTopology call if ``save`` is set or any
+        queued call asked for a save. Nested blocks join the outer batch.
+        """
+        with self._batch_lock:
+            if self._batch is not None:
+                self._batch.save = self._batch.save or save
+                outer = self._batch
+            else:
+                outer = None
+                self._batch = TopologyBatch(save=save)
+            batch = self._batch
+        if outer is not None:
+            yield outer
+            return
+        try:
+            yield batch
+        finally:
+            with self._batch_lock:
+                self._batch = None
+        self._flush_batch(batch)
+
+    def _sync_images(self, image_names: List[str], workers: int) -> List[Any]:
+        existing = {image.get("name"): image for image in self.iter_images()}
+        cache = DigestCache()
+
+        def sync(image_name: str) -> Any:
+            image = existing.get(image_name)
+            if image is None:
+                return self.add_image(image_name)
+            if image_matches(cache.digests(image_name), image) is False:
+                log.warning("%s differs from the image on CloudVision", image_name)
+                try:
+                    return self.add_image(image_name)
+                except CvpWarning:
+                    pass
+            return image
+
+        outcomes = Engine(workers=workers).run(sync, image_names)
+        cache.save()
+        for outcome in outcomes:
+            if not outcome.ok:
+                raise outcome.error
+        return [outcome.result for outcome in outcomes]
 
     def _get_or_save_image_bundle(self, bundle_name: str, *image_names: str) -> Any:
         try:
@@ -404,62 +972,36 @@ class ConvCloudVision(CloudVision):
         save: Optional[bool] = False,
     ) -> Any:
         device = self.get_device_by_name(device_name)
-        device_id = device.get("key")
-        device_ip = device.get("ipAddress")
-
-        configlet_names = []
-        configlet_keys = []
-        for configlet in configlets:
-            configlet_names.append(configlet["name"])
-            configlet_keys.append(configlet["key"])
-
-        info = f"Assign configlets to {device_name}"
-        payload = {
-            "info": info,
-            "infoPreview": info,
-            "note": "",
-            "action": "associate",
-            "nodeType": "configlet",
-            "nodeId": "",
-            "configletList": configlet_keys,
-            "configletNamesList": configlet_names,
-            "ignoreConfigletNamesList": [],
-            "ignoreConfigletList": [],
-            "configletBuilderList": [],
-            "configletBuilderNamesList": [],
-            "ignoreConfigletBuilderList": [],
-            "ignoreConfigletBuilderNamesList": [],
-            "toId": device_id,
-            "toIdType": "netelement",
-            "fromId": "",
-            "nodeName": "",
-            "fromName": "",
-            "toName": device_name,
-            "nodeIpAddress": device_ip,
-            "nodeTargetIpAddress": target_ip or device_ip,
-            "childTasks": [],
-            "parentTask": "",
-        }
+        payload = _configlets_payload(configlets, device, device_name, target_ip)
         response = self._add_temp_action(payload)
         if save:
             self._save_topology()
         return response
 
-    def create_image_bundle(self, bundle_name: str, *image_names: str) -> Any:
-        image_data = []
-        for image_name in image_names:
-            response = self._get_or_add_image(image_name)
-            image_data.append(response)
+    def create_image_bundle(
+        self, bundle_name: str, *image_names: str, workers: Optional[int] = 4
+    ) -> Any:
+        image_data = self._sync_images(list(image_names), workers)
         return self._get_or_save_image_bundle(bundle_name, *image_data)
 
     def get_container_by_name(self, container_name: str) -> str:
+        if self.cache_topology:
+            if container := self.topology.container(container_name):
+                return container
         response = self.search_topology(container_name)
         if containers := response.get("containerList"):
+            if self._topology is not None:
+                self._topology.add_container(containers[0])
             return containers[0]
 
     def get_device_by_name(self, device_name: str) -> str:
+        if self.cache_topology:
+            if device := self.topology.device(device_name):
+                return device
         response = self.search_topology(device_name)
         if devices := response.get("netElementList"):
+            if self._topology is not None:
+                self._topology.add_device(devices[0])
             return devices[0]
 
     def get_configlets_by_device_name(self, device_name: str) -> Any:
@@ -473,26 +1015,11 @@ class ConvCloudVision(CloudVision):
         device_name: str,
         save: Optional[bool] = False,
     ) -> Any:
-        to_container_id = self.get_container_by_name(container_name).get("key")
-        if device := self.get_device_by_name(device_name):
-            device_id = device.get("key")
-            from_container_id = device.get("parentContainerId")
-        else:
+        container = self.get_container_by_name(container_name)
+        if not (device := self.get_device_by_name(device_name)):
             return
 
-        info = f"Move {device_name} to {container_name}"
-        payload = {
-            "info": info,
-            "infoPreview": info,
-            "action": "update",
-            "nodeType": "netelement",
-            "nodeId": device_id,
-            "toId": to_container_id,
-            "fromId": from_container_id,
-            "nodeName": device_name,
-            "toName": container_name,
-            "toIdType": "container",
-        }
+        payload = _move_payload(container, container_name, device, device_name)
         warnings = {
             122518,  # Data already exists in Database
         }
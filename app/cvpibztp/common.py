@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 
-from distutils.util import strtobool
 from os import getenv
 
 LOOPBACK = "127.0.0.1"
 
 
 def _str2bool(string: str) -> bool:
-    return bool(strtobool(string))
+    value = string.lower()
+    if value in {"y", "yes", "t", "true", "on", "1"}:
+        return True
+    if value in {"n", "no", "f", "false", "off", "0"}:
+        return False
+    raise ValueError(f"invalid truth value {string!r}")
 
 
 def connection_details():
@@ -16,4 +20,62 @@ def connection_details():
         "password": getenv("CVPIBZTP_PASSWORD"),
         "server": getenv("CVPIBZTP_SERVER", LOOPBACK),
         "verify": _str2bool(getenv("CVPIBZTP_VERIFY", "True")),
+        "scheme": getenv("CVPIBZTP_SCHEME", "https"),
+        "timeout": float(timeout) if (timeout := getenv("CVPIBZTP_TIMEOUT")) else None,
+        "pool_size": worker_count(),
+        "metrics_path": getenv("CVPIBZTP_METRICS"),
+        "session_file": getenv("CVPIBZTP_SESSION_FILE"),
+        "rates": rate_limits(),
+        "trace_path": getenv("CVPIBZTP_TRACE"),
+    }
+
+
+def rate_limits():
+    """Parse ``CVPIBZTP_RATES`` such as ``searchTopology.do=20,getTasks.do=5``."""
+    if (value := getenv("CVPIBZTP_RATES")) is None:
+        return None
+    rates = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        endpoint, _, rate = item.partition("=")
+        rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+def worker_count() -> int:
+    return int(getenv("CVPIBZTP_WORKERS", "8"))
+
+
+def checkpoint_path():
+    return getenv("CVPIBZTP_CHECKPOINT")
+
+
+def seed_settings():
+    return {
+        "configlet": getenv("CVPIBZTP_SEED", "ztp_seed_data.yaml"),
+        "cache_path": getenv("CVPIBZTP_SEED_CACHE"),
+    }
+
+
+def watch_settings():
+    return {
+        "enabled": _str2bool(getenv("CVPIBZTP_WATCH", "False")),
+        "minimum": float(getenv("CVPIBZTP_WATCH_MIN_INTERVAL", "5")),
+        "maximum": float(getenv("CVPIBZTP_WATCH_MAX_INTERVAL", "120")),
+    }
+
+
+def plan_mode() -> str:
+    mode = getenv("CVPIBZTP_PLAN", "").lower()
+    if mode not in {"", "dry-run", "apply"}:
+        raise ValueError(f"CVPIBZTP_PLAN must be 'dry-run' or 'apply', not {mode!r}")
+    return mode
+
+
+def task_settings():
+    mode = getenv("CVPIBZTP_TASKS", "").lower()
+    if mode not in {"", "wait", "execute"}:
+        raise ValueError(f"CVPIBZTP_TASKS must be 'wait' or 'execute', not {mode!r}")
+    return {
+        "mode": mode,
+        "timeout": float(getenv("CVPIBZTP_TASK_TIMEOUT", "1800")),
     }
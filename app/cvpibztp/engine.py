@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+
+class Outcome(NamedTuple):
+    item: Any
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class Engine:
+    """Run a callable over items on a bounded thread pool.
+
+    Stages inside one call stay ordered; failures are captured per item.
+    """
+
+    def __init__(self, workers: Optional[int] = DEFAULT_WORKERS) -> None:
+        self.workers = max(1, workers or 1)
+
+    @staticmethod
+    def _call(func: Callable[[Any], Any], item: Any) -> Outcome:
+        try:
+            return Outcome(item, result=func(item))
+        except Exception as exc:
+            log.exception("Processing %r failed", item)
+            return Outcome(item, error=exc)
+
+    def run(self, func: Callable[[Any], Any], items: Iterable[Any]) -> List[Outcome]:
+        items = list(items)
+        call = partial(self._call, func)
+        if self.workers == 1 or len(items) <= 1:
+            return [call(item) for item in items]
+        workers = min(self.workers, len(items))
+        with ThreadPoolExecutor(workers, thread_name_prefix="cvpibztp") as pool:
+            return list(pool.map(call, items))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+ALGORITHMS = ("sha512", "md5")
+CHUNK_SIZE = 1 << 20
+
+
+def default_cache_path() -> Path:
+    return Path(
+        os.getenv(
+            "CVPIBZTP_DIGEST_CACHE",
+            Path.home() / ".cache" / "cvpibztp" / "digests.json",
+        )
+    )
+
+
+def file_digests(path: str, chunk_size: Optional[int] = CHUNK_SIZE) -> Dict[str, str]:
+    hashes = {algorithm: hashlib.new(algorithm) for algorithm in ALGORITHMS}
+    with open(path, "rb") as io:
+        while chunk := io.read(chunk_size):
+            for digest in hashes.values():
+                digest.update(chunk)
+    return {algorithm: digest.hexdigest() for algorithm, digest in hashes.items()}
+
+
+class DigestCache:
+    """File digests cached by absolute path, mtime and size."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path) if path else default_cache_path()
+        self._lock = threading.Lock()
+        try:
+            self._entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def digests(self, path: str) -> Dict[str, str]:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if (
+            entry
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            return entry["digests"]
+        log.debug("Hashing %s", path)
+        digests = file_digests(path)
+        with self._lock:
+            self._entries[path] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "digests": digests,
+            }
+        return digests
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self._entries)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(data)
+            tmp.replace(self.path)
+        except OSError as exc:
+            log.warning("Could not save digest cache %s: %s", self.path, exc)
+
+
+def image_matches(digests: Dict[str, str], image: Dict[str, Any]) -> Optional[bool]:
+    """Compare local digests with CloudVision image metadata.
+
+    Returns None when the metadata carries none of the known digests.
+    """
+    for algorithm in ALGORITHMS:
+        if remote := image.get(algorithm):
+            return remote.lower() == digests[algorithm]
+    return None
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+FIELDS = ("parentContainerKey", "serialNumber", "systemMacAddress", "fqdn")
+
+
+class DeviceRecord:
+    """The inventory fields the provisioning pipeline reads.
+
+    Supports ``record["fqdn"]`` and ``record.get("fqdn")`` so it can stand
+    in for the full inventory dict.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(
+        self,
+        parentContainerKey: str,
+        serialNumber: str,
+        systemMacAddress: str,
+        fqdn: str,
+    ) -> None:
+        self.parentContainerKey = parentContainerKey
+        self.serialNumber = serialNumber
+        self.systemMacAddress = systemMacAddress
+        self.fqdn = fqdn
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DeviceRecord":
+        return cls(*(data.get(field) for field in FIELDS))
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, DeviceRecord):
+            return NotImplemented
+        return all(self[field] == other[field] for field in FIELDS)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{field}={self[field]!r}" for field in FIELDS)
+        return f"DeviceRecord({fields})"
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name, default)
+
+
+def _is_device(data: dict) -> bool:
+    return "serialNumber" in data and "systemMacAddress" in data
+
+
+def inventory_decoder(container: Optional[str] = None) -> Callable[[bytes], Any]:
+    """Build a decoder that turns an inventory response into DeviceRecords.
+
+    Every device is still parsed into a dict; those outside ``container``
+    are dropped instead of becoming DeviceRecords. orjson is used when it
+    is installed, the standard library otherwise.
+    """
+
+    def wanted(data: dict) -> bool:
+        return container is None or data.get("parentContainerKey") == container
+
+    if orjson is not None:
+
+        def decode(content: bytes) -> Any:
+            data = orjson.loads(content)
+            if not isinstance(data, list):
+                return data
+            return [
+                DeviceRecord.from_dict(item)
+                for item in data
+                if _is_device(item) and wanted(item)
+            ]
+
+        return decode
+
+    def hook(data: dict) -> Any:
+        if _is_device(data):
+            return DeviceRecord.from_dict(data) if wanted(data) else None
+        return data
+
+    def decode(content: bytes) -> Any:
+        data = json.loads(content, object_hook=hook)
+        if not isinstance(data, list):
+            return data
+        return [item for item in data if isinstance(item, DeviceRecord)]
+
+    return decode
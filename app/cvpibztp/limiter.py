@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Requests per second for the endpoints that are expensive on CloudVision
+DEFAULT_RATES = {
+    "searchTopology.do": 20.0,
+    "addTempAction.do": 10.0,
+}
+
+
+class TokenBucket:
+    """Rate limit shared by threads; callers queue behind earlier ones."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Every uncongested response raises the limit by ``1 / limit``. A 429/5xx,
+    a connection error or a latency of more than ``tolerance`` times the
+    baseline (and ``slack`` seconds above it) cuts the limit by ``backoff``,
+    at most once per baseline round trip.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: Optional[int] = 1,
+        tolerance: Optional[float] = 2.0,
+        slack: Optional[float] = 0.05,
+        backoff: Optional[float] = 0.5,
+    ) -> None:
+        self.maximum = max(minimum, maximum)
+        self.minimum = minimum
+        self.tolerance = tolerance
+        self.slack = slack
+        self.backoff = backoff
+        self.limit = float(max(minimum, maximum // 2))
+        self.baseline: Optional[float] = None
+        self.inflight = 0
+        self._decreased = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.inflight >= int(self.limit):
+                self._condition.wait()
+            self.inflight += 1
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        with self._condition:
+            self.inflight -= 1
+            if not overloaded:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline += (latency - self.baseline) * 0.01
+                overloaded = (
+                    latency > self.baseline * self.tolerance
+                    and latency - self.baseline > self.slack
+                )
+            now = time.monotonic()
+            if overloaded:
+                if now - self._decreased > (self.baseline or 0.0):
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._decreased = now
+                    log.debug("Concurrency limit lowered to %d", self.limit)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class Permit:
+    overloaded = False
+
+
+class Limiter:
+    """Per-endpoint token buckets and adaptive concurrency limits."""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = 10,
+        rates: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.concurrency = concurrency
+        self.rates = DEFAULT_RATES if rates is None else rates
+        self._endpoints: Dict[
+            str, Tuple[Optional[TokenBucket], AdaptiveConcurrency]
+        ] = {}
+        self._lock = threading.Lock()
+
+    def _limits(
+        self, endpoint: str
+    ) -> Tuple[Optional[TokenBucket], AdaptiveConcurrency]:
+        path = endpoint.split("?", 1)[0]
+        with self._lock:
+            if (limits := self._endpoints.get(path)) is None:
+                rate = self.rates.get(path.rsplit("/", 1)[-1])
+                limits = self._endpoints[path] = (
+                    TokenBucket(rate) if rate else None,
+                    AdaptiveConcurrency(self.concurrency),
+                )
+        return limits
+
+    @contextmanager
+    def permit(self, endpoint: str) -> Iterator[Permit]:
+        """Wait for a token and a free slot; set ``overloaded`` on bad replies."""
+        bucket, concurrency = self._limits(endpoint)
+        if bucket:
+            bucket.acquire()
+        concurrency.acquire()
+        permit = Permit()
+        started = time.monotonic()
+        try:
+            yield permit
+        except OSError:
+            permit.overloaded = True
+            raise
+        finally:
+            concurrency.release(time.monotonic() - started, permit.overloaded)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        return {
+            path: {
+                "rate": bucket.rate if bucket else 0.0,
+                "limit": concurrency.limit,
+                "baseline": concurrency.baseline or 0.0,
+            }
+            for path, (bucket, concurrency) in endpoints.items()
+        }
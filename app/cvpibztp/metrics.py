@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+OUTCOMES = ("ok", "warning", "error")
+
+
+class Sample:
+    __slots__ = ("size",)
+
+    def __init__(self) -> None:
+        self.size = 0
+
+
+class EndpointStats:
+    __slots__ = ("count", "outcomes", "retries", "latency", "buckets", "size")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.retries = 0
+        self.latency = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.size = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, total = {}, 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.buckets):
+            total += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = total
+        return {
+            "count": self.count,
+            "outcomes": dict(self.outcomes),
+            "retries": self.retries,
+            "latency_seconds": self.latency,
+            "latency_buckets": cumulative,
+            "response_bytes": self.size,
+        }
+
+
+def _label(endpoint: str) -> str:
+    return endpoint.partition("?")[0]
+
+
+class Metrics:
+    """Per-endpoint request counters and latency histograms."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], EndpointStats] = {}
+
+    def _get(self, method: str, endpoint: str) -> EndpointStats:
+        key = (method, _label(endpoint))
+        if (stats := self._stats.get(key)) is None:
+            stats = self._stats.setdefault(key, EndpointStats())
+        return stats
+
+    def observe(
+        self, method: str, endpoint: str, latency: float, size: int, outcome: str
+    ) -> None:
+        index = next(
+            (i for i, bound in enumerate(BUCKETS) if latency <= bound), len(BUCKETS)
+        )
+        with self._lock:
+            stats = self._get(method, endpoint)
+            stats.count += 1
+            stats.outcomes[outcome] += 1
+            stats.latency += latency
+            stats.buckets[index] += 1
+            stats.size += size
+
+    def retried(self, method: str, endpoint: str) -> None:
+        with self._lock:
+            self._get(method, endpoint).retries += 1
+
+    @contextmanager
+    def measure(self, method: str, endpoint: str) -> Iterator[Sample]:
+        sample = Sample()
+        outcome = "ok"
+        started = time.perf_counter()
+        try:
+            yield sample
+        except RuntimeWarning:
+            outcome = "warning"
+            raise
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            self.observe(method, endpoint, latency, sample.size, outcome)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"method": method, "endpoint": endpoint, **stats.to_dict()}
+                for (method, endpoint), stats in sorted(self._stats.items())
+            ]
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        entries = [
+            (f'method="{e["method"]}",endpoint="{e["endpoint"]}"', e)
+            for e in self.snapshot()
+        ]
+        # Every metric family is one block under its TYPE line
+        lines = ["# TYPE cvpibztp_requests_total counter"]
+        for labels, entry in entries:
+            for outcome, count in entry["outcomes"].items():
+                lines.append(
+                    f'cvpibztp_requests_total{{{labels},outcome="{outcome}"}} {count}'
+                )
+        lines.append("# TYPE cvpibztp_request_retries_total counter")
+        for labels, entry in entries:
+            lines.append(
+                f"cvpibztp_request_retries_total{{{labels}}} {entry['retries']}"
+            )
+        lines.append("# TYPE cvpibztp_response_bytes_total counter")
+        for labels, entry in entries:
+            lines.append(
+                f"cvpibztp_response_bytes_total{{{labels}}} {entry['response_bytes']}"
+            )
+        name = "cvpibztp_request_duration_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for labels, entry in entries:
+            for bound, count in entry["latency_buckets"].items():
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {entry['latency_seconds']}")
+            lines.append(f"{name}_count{{{labels}}} {entry['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Optional[str]) -> None:
+        """Write JSON for ``*.json`` paths, Prometheus text otherwise."""
+        if not path:
+            return
+        data = self.to_json() if str(path).endswith(".json") else self.to_prometheus()
+        # Replace the file in one step so a scraper never reads half of it
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w") as io:
+                io.write(data)
+            os.replace(tmp, path)
+        except OSError as exc:
+            log.warning("Could not write metrics %s: %s", path, exc)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional
+
+DEFAULT_PAGE_SIZE = 100
+
+
+def _records(response: Any, key: str) -> List[Any]:
+    return (response or {}).get(key) or []
+
+
+def iter_pages(
+    fetch: Callable[[int, int], Any],
+    key: str,
+    page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+    prefetch: Optional[bool] = False,
+) -> Iterator[Any]:
+    """Yield the records under ``key`` from successive ``fetch(start, end)`` pages.
+
+    A page shorter than ``page_size`` ends the scan. With ``prefetch`` the
+    next page is requested in the background while the current one is consumed.
+    """
+    start = 0
+    if not prefetch:
+        while True:
+            records = _records(fetch(start, start + page_size), key)
+            yield from records
+            if len(records) < page_size:
+                return
+            start += page_size
+
+    with ThreadPoolExecutor(1, thread_name_prefix="cvpibztp-page") as pool:
+        future = pool.submit(fetch, start, start + page_size)
+        while future is not None:
+            records = _records(future.result(), key)
+            future = None
+            if len(records) >= page_size:
+                start += page_size
+                future = pool.submit(fetch, start, start + page_size)
+            yield from records
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class DevicePlan(NamedTuple):
+    device: Any
+    data: Dict[str, Any]
+    move: Optional[str] = None
+    assigned: List[Dict[str, Any]] = []
+    missing: List[str] = []
+    builder: Optional[str] = None
+
+    @property
+    def changes(self) -> bool:
+        return bool(self.move or self.missing or self.builder)
+
+    def describe(self) -> str:
+        steps = []
+        if self.move:
+            steps.append(f"move to {self.move}")
+        if self.missing:
+            steps.append(f"associate {', '.join(self.missing)}")
+        if self.builder:
+            steps.append(f"generate {self.builder}")
+        name = self.data.get("name") or self.device.get("fqdn")
+        serial = self.device.get("serialNumber")
+        return f"{name} ({serial}): {'; '.join(steps) or 'no changes'}"
+
+
+def plan_device(cvp, catalogue, seed_data, builders, device) -> Optional[DevicePlan]:
+    """Diff a device's container and configlets against its seed entry.
+
+    Returns None for devices without a seed entry. Devices that have to move
+    are planned in full without reading their current configlets, because
+    they are re-associated in their new container anyway.
+    """
+    with cvp.tracer.span("plan", cat="device", serial=device["serialNumber"]):
+        data = seed_data.get(device["serialNumber"])
+        if data is None:
+            return None
+
+        container_name = data.get("container")
+        builder = builders.get(container_name)
+        desired = [
+            configlet["name"] for configlet in catalogue.for_device(data.get("name"))
+        ]
+        current = cvp.get_device_by_name(device.get("fqdn")) or {}
+        container = cvp.get_container_by_name(container_name) or {}
+        if (
+            not container.get("key")
+            or current.get("parentContainerId") != container["key"]
+        ):
+            return DevicePlan(device, data, container_name, [], desired, builder)
+
+        assigned = list(cvp.iter_configlets_by_device(current.get("key")))
+        names = {configlet.get("name") for configlet in assigned}
+        missing = [name for name in desired if name not in names]
+        if any(configlet.get("type") == "Generated" for configlet in assigned):
+            builder = None
+        return DevicePlan(device, data, None, assigned, missing, builder)
+
+
+def format_plan(plans: List[DevicePlan]) -> str:
+    changes = [plan for plan in plans if plan.changes]
+    lines = [f"{len(plans)} devices planned, {len(changes)} with changes"]
+    lines.extend(f"  {plan.describe()}" for plan in changes)
+    return "\n".join(lines)
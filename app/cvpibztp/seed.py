@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class SeedDataError(ValueError):
+    pass
+
+
+def load_yaml(data: str) -> Any:
+    from ruamel.yaml import YAML
+
+    return YAML(typ="safe").load(data) or []
+
+
+def iter_jsonl(data: str) -> Iterator[Dict[str, Any]]:
+    """One JSON object per line; blank lines and ``#`` comments are skipped."""
+    for number, line in enumerate(io.StringIO(data), 1):
+        if not (line := line.strip()) or line.startswith("#"):
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            raise SeedDataError(f"Invalid seed data on line {number}: {exc}")
+
+
+def iter_csv(data: str) -> Iterator[Dict[str, Any]]:
+    """Rows below a header naming the fields; empty cells are left out."""
+    for row in csv.DictReader(io.StringIO(data), skipinitialspace=True):
+        yield {
+            field.strip(): value.strip()
+            for field, value in row.items()
+            if field and value and value.strip()
+        }
+
+
+# Parsers by configlet name suffix; anything else is read as YAML
+FORMATS: Dict[str, Callable[[str], Iterable[Dict[str, Any]]]] = {
+    ".jsonl": iter_jsonl,
+    ".csv": iter_csv,
+}
+
+
+def seed_format(name: str) -> Callable[[str], Iterable[Dict[str, Any]]]:
+    return FORMATS.get(Path(name or "").suffix.lower(), load_yaml)
+
+
+class SeedData:
+    """Seed entries indexed by serial number, name and IP address."""
+
+    def __init__(self, entries: Iterable[Dict[str, Any]]) -> None:
+        self.entries: List[Dict[str, Any]] = []
+        self.by_serial: Dict[str, Dict[str, Any]] = {}
+        self.by_name: Dict[str, Dict[str, Any]] = {}
+        self.by_ip: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            self._add(entry)
+
+    def __contains__(self, serial: str) -> bool:
+        return serial in self.by_serial
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def from_yaml(cls, data: str) -> "SeedData":
+        return cls(load_yaml(data))
+
+    @classmethod
+    def parse(cls, data: str, name: Optional[str] = "") -> "SeedData":
+        """Parse ``data`` in the format given by the suffix of ``name``."""
+        return cls(seed_format(name)(data or ""))
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        if not isinstance(entry, dict) or not entry.get("serial"):
+            raise SeedDataError(f"Seed entry without serial: {entry!r}")
+        indexes = {"serial": self.by_serial, "name": self.by_name, "ip": self.by_ip}
+        for field, index in indexes.items():
+            value = entry.get(field)
+            if value is not None and value in index:
+                raise SeedDataError(f"Duplicate {field} {value!r} in seed data")
+        for field, index in indexes.items():
+            if (value := entry.get(field)) is not None:
+                index[value] = entry
+        self.entries.append(entry)
+
+    def get(self, serial: str) -> Optional[Dict[str, Any]]:
+        return self.by_serial.get(serial)
+
+
+def content_digest(data: Optional[str]) -> str:
+    return hashlib.sha256((data or "").encode()).hexdigest()
+
+
+class SeedCache:
+    """Parsed seed data reused while the seed configlet's content is unchanged.
+
+    The last result is kept in memory and, given a ``path``, as JSON on disk
+    so a restart skips parsing as well.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._key: Optional[tuple] = None
+        self._data: Optional[SeedData] = None
+
+    def load(self, name: str, data: Optional[str]) -> SeedData:
+        key = (name, content_digest(data))
+        with self._lock:
+            if key == self._key:
+                return self._data
+            if (entries := self._read(key)) is not None:
+                log.debug("Seed data %s loaded from %s", name, self.path)
+                seed_data = SeedData(entries)
+            else:
+                log.debug("Parsing seed data %s", name)
+                seed_data = SeedData.parse(data, name)
+                self._write(key, seed_data)
+            self._key, self._data = key, seed_data
+            return seed_data
+
+    def _read(self, key: tuple) -> Optional[List[Dict[str, Any]]]:
+        if not self.path:
+            return None
+        try:
+            cached = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return None
+        if [cached.get("name"), cached.get("digest")] != list(key):
+            return None
+        return cached.get("entries")
+
+    def _write(self, key: tuple, seed_data: SeedData) -> None:
+        if not self.path:
+            return
+        name, digest = key
+        data = {"name": name, "digest": digest, "entries": seed_data.entries}
+        # A cache hit must return what parsing does: skip entries holding
+        # values JSON would change, such as YAML dates or integer keys
+        try:
+            encoded = json.dumps(data)
+            unchanged = json.loads(encoded)["entries"] == seed_data.entries
+        except (TypeError, ValueError):
+            unchanged = False
+        if not unchanged:
+            log.debug("Seed data %s has non-JSON values, not caching it", name)
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(encoded)
+            tmp.replace(self.path)
+        except OSError as exc:
+            log.warning("Could not write seed cache %s: %s", self.path, exc)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict
+
+log = logging.getLogger(__name__)
+
+
+class SessionFile:
+    """CloudVision session cookies shared between client processes.
+
+    The file is written with owner-only permissions and is ignored when it is
+    readable by anyone else or belongs to another server or user.
+    """
+
+    def __init__(self, path: str, server: str, username: str) -> None:
+        self.path = Path(path).expanduser()
+        self.server = server
+        self.username = username
+
+    def load(self) -> Dict[str, str]:
+        try:
+            if self.path.stat().st_mode & 0o077:
+                log.warning("Ignoring session file %s with open permissions", self.path)
+                return {}
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            log.warning("Ignoring unreadable session file %s: %s", self.path, exc)
+            return {}
+        if data.get("server") != self.server or data.get("username") != self.username:
+            return {}
+        return data.get("cookies") or {}
+
+    def save(self, cookies: Dict[str, str]) -> None:
+        data = json.dumps(
+            {"server": self.server, "username": self.username, "cookies": cookies}
+        )
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as stream:
+                stream.write(data)
+            tmp.replace(self.path)
+        except OSError as exc:
+            log.warning("Could not save session file %s: %s", self.path, exc)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from cvpibztp.cloudvision import CvpWarning
+from cvpibztp.engine import Engine
+
+log = logging.getLogger(__name__)
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+
+def content_hash(data: Optional[str]) -> str:
+    normalized = "\n".join(
+        line.rstrip() for line in (data or "").replace("\r\n", "\n").splitlines()
+    ).strip()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def sync_configlets(
+    cvp, path: Path, workers: Optional[int] = 8
+) -> Dict[str, List[str]]:
+    """Create, update or skip the configlets and builders found in ``path``.
+
+    Files ending in ``.py`` are configlet builders, everything else is a
+    static configlet named after the file. Returns the file names by outcome.
+    """
+    configlets = {item.get("name"): item for item in cvp.iter_configlets("Configlet")}
+    builders = {item.get("name"): item for item in cvp.iter_configlets("Builder")}
+
+    def create(func, data: str, name: str) -> str:
+        try:
+            func(data=data, name=name)
+        except CvpWarning:
+            return UNCHANGED
+        return CREATED
+
+    def sync(local: Path) -> str:
+        data = local.read_text()
+        if local.name.endswith(".py"):
+            if (builder := builders.get(local.name)) is None:
+                return create(cvp.add_configlet_builder, data, local.name)
+            remote = cvp.get_configlet_builder(builder["key"])
+            script = remote.get("data", {}).get("main_script", {}).get("data")
+            if content_hash(script) == content_hash(data):
+                return UNCHANGED
+            cvp.update_configlet_builder(builder["key"], data=data, name=local.name)
+            return UPDATED
+
+        if (configlet := configlets.get(local.name)) is None:
+            return create(cvp.add_configlet, data, local.name)
+        if content_hash(configlet.get("config")) == content_hash(data):
+            return UNCHANGED
+        cvp.update_configlet(configlet["key"], data=data, name=local.name)
+        return UPDATED
+
+    files = sorted(item for item in path.iterdir() if item.is_file())
+    summary = {CREATED: [], UPDATED: [], UNCHANGED: [], FAILED: []}
+    for outcome in Engine(workers=workers).run(sync, files):
+        summary[outcome.result if outcome.ok else FAILED].append(outcome.item.name)
+    return summary
+
+
+def format_summary(summary: Dict[str, List[str]]) -> str:
+    lines = [", ".join(f"{len(names)} {state}" for state, names in summary.items())]
+    for state in (CREATED, UPDATED, FAILED):
+        lines.extend(f"  {state}: {name}" for name in summary[state])
+    return "\n".join(lines)
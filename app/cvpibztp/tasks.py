@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from cvpibztp.engine import Engine
+from cvpibztp.watch import AdaptiveInterval
+
+log = logging.getLogger(__name__)
+
+COMPLETED = "Completed"
+TIMEOUT = "Timeout"
+FINISHED = frozenset({COMPLETED, "Failed", "Cancelled"})
+
+
+class TaskResult(NamedTuple):
+    task_id: str
+    device: Optional[str]
+    serial: Optional[str]
+    status: str
+    latency: float
+
+    @property
+    def ok(self) -> bool:
+        return self.status == COMPLETED
+
+
+class TaskMonitor:
+    """Follow the tasks handed to ``add`` until they finish.
+
+    Task status is read one task at a time on ``workers`` threads, or by
+    paging through getTasks.do once more than ``scan_threshold`` tasks are
+    outstanding. Latency is measured from when a task was added.
+    """
+
+    def __init__(
+        self,
+        cvp,
+        workers: Optional[int] = 8,
+        minimum: Optional[float] = 1.0,
+        maximum: Optional[float] = 30.0,
+        scan_threshold: Optional[int] = 20,
+    ) -> None:
+        self.cvp = cvp
+        self.engine = Engine(workers=workers)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.scan_threshold = scan_threshold
+        self._pending: Dict[str, float] = {}
+        self._executed: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> List[str]:
+        with self._lock:
+            return list(self._pending)
+
+    def add(self, task_ids: Iterable[Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for task_id in task_ids:
+                self._pending.setdefault(str(task_id), now)
+
+    def execute(self) -> List[str]:
+        with self._lock:
+            task_ids = [t for t in self._pending if t not in self._executed]
+            self._executed.update(task_ids)
+        if task_ids:
+            log.info("Executing %d tasks", len(task_ids))
+            self.cvp.execute_tasks(task_ids)
+        return task_ids
+
+    def _fetch(self, task_ids: List[str]) -> List[Dict[str, Any]]:
+        if len(task_ids) <= self.scan_threshold:
+            outcomes = self.engine.run(self.cvp.get_task_by_id, task_ids)
+            return [outcome.result for outcome in outcomes if outcome.ok]
+
+        wanted, tasks = set(task_ids), []
+        for task in self.cvp.iter_tasks():
+            if (task_id := str(task.get("workOrderId"))) in wanted:
+                tasks.append(task)
+                wanted.discard(task_id)
+                if not wanted:
+                    break
+        return tasks
+
+    def poll(self) -> List[TaskResult]:
+        """Query the outstanding tasks once and return those that finished."""
+        finished = []
+        now = time.monotonic()
+        for task in self._fetch(self.pending):
+            status = task.get("workOrderUserDefinedStatus")
+            if status not in FINISHED:
+                continue
+            task_id = str(task.get("workOrderId"))
+            details = task.get("workOrderDetails") or {}
+            with self._lock:
+                if (started := self._pending.pop(task_id, None)) is None:
+                    continue
+            result = TaskResult(
+                task_id,
+                details.get("netElementHostName"),
+                details.get("serialNumber"),
+                status,
+                now - started,
+            )
+            log.info(
+                "Task %s for %s %s after %.1fs",
+                task_id,
+                result.device,
+                status.lower(),
+                result.latency,
+            )
+            finished.append(result)
+        return finished
+
+    def wait(self, timeout: Optional[float] = None) -> List[TaskResult]:
+        """Poll with backoff until every task finished or ``timeout`` passed.
+
+        Tasks still running at the deadline are reported as ``Timeout``.
+        """
+        interval = AdaptiveInterval(self.minimum, self.maximum)
+        deadline = time.monotonic() + timeout if timeout else None
+        results, first = [], True
+        while self.pending:
+            finished = self.poll()
+            results.extend(finished)
+            if not self.pending:
+                break
+            # the first wait and any progress restart at the minimum interval
+            delay = interval.next(bool(finished) or first)
+            first = False
+            if deadline:
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    break
+                delay = min(delay, remaining)
+            log.debug("%d tasks running, next poll in %.1fs", len(self.pending), delay)
+            time.sleep(delay)
+
+        now = time.monotonic()
+        with self._lock:
+            expired, self._pending = self._pending, {}
+        results.extend(
+            TaskResult(task_id, None, None, TIMEOUT, now - started)
+            for task_id, started in expired.items()
+        )
+        return results
+
+
+def format_tasks(results: List[TaskResult]) -> str:
+    if not results:
+        return "no tasks"
+    latencies = sorted(result.latency for result in results if result.ok)
+    failed = [result for result in results if not result.ok]
+    lines = [f"{len(latencies)} tasks completed, {len(failed)} failed"]
+    if latencies:
+        median = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        lines.append(
+            f"  latency median {median:.1f}s, p95 {p95:.1f}s, max {latencies[-1]:.1f}s"
+        )
+    lines.extend(
+        f"  task {result.task_id} {result.device or ''} "
+        f"({result.serial or 'unknown'}): {result.status}"
+        for result in failed
+    )
+    return "\n".join(lines)
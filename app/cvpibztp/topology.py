@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+
+class Topology:
+    """Local snapshot of the CloudVision containers and net elements."""
+
+    def __init__(
+        self,
+        containers: Optional[Iterable[Dict[str, Any]]] = (),
+        devices: Optional[Iterable[Dict[str, Any]]] = (),
+    ) -> None:
+        self._lock = threading.RLock()
+        self.containers_by_key: Dict[str, Dict[str, Any]] = {}
+        self.containers_by_name: Dict[str, Dict[str, Any]] = {}
+        self.devices_by_key: Dict[str, Dict[str, Any]] = {}
+        self.devices_by_name: Dict[str, Dict[str, Any]] = {}
+        self.devices_by_mac: Dict[str, Dict[str, Any]] = {}
+        self.devices_by_serial: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        for container in containers or ():
+            self.add_container(container)
+        for device in devices or ():
+            self.add_device(device)
+
+    @classmethod
+    def from_search(cls, response: Dict[str, Any]) -> "Topology":
+        return cls(
+            containers=response.get("containerList") or (),
+            devices=response.get("netElementList") or (),
+        )
+
+    def add_container(self, container: Dict[str, Any]) -> None:
+        with self._lock:
+            if key := container.get("key"):
+                self.containers_by_key[key] = container
+            if name := container.get("name"):
+                self.containers_by_name[name] = container
+
+    def add_device(self, device: Dict[str, Any]) -> None:
+        with self._lock:
+            if key := device.get("key"):
+                self.devices_by_key[key] = device
+            for name in {device.get("fqdn"), device.get("hostname")}:
+                if name:
+                    self.devices_by_name[name] = device
+            if mac := device.get("systemMacAddress"):
+                self.devices_by_mac[mac] = device
+            if serial := device.get("serialNumber"):
+                self.devices_by_serial[serial] = device
+
+    def container(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.containers_by_name.get(name)
+
+    def device(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.devices_by_name.get(name)
+
+    def apply(self, action: Dict[str, Any]) -> None:
+        """Reflect a topology temp action posted by this client."""
+        node_type = action.get("nodeType")
+        with self._lock:
+            if action.get("action") == "add" and node_type == "container":
+                container = {
+                    "key": action.get("nodeId"),
+                    "name": action.get("nodeName"),
+                    "parentContainerId": action.get("toId"),
+                }
+                self._pending[container["name"]] = container
+                self.add_container(container)
+            elif action.get("action") == "update" and node_type == "netelement":
+                if device := self.devices_by_key.get(action.get("nodeId")):
+                    device["parentContainerId"] = action.get("toId")
+                    if container := self.containers_by_key.get(action.get("toId")):
+                        device["parentContainerName"] = container.get("name")
+
+    def saved(self) -> None:
+        """Forget containers created in this session.
+
+        CloudVision assigns the final container keys on save, so the
+        temporary keys must be looked up again.
+        """
+        with self._lock:
+            for name, container in self._pending.items():
+                self.containers_by_name.pop(name, None)
+                self.containers_by_key.pop(container.get("key"), None)
+            self._pending.clear()
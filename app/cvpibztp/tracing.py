@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, ContextManager, Deque, Dict, Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+# Arguments of the innermost open span, inherited by its children
+_current: ContextVar[Dict[str, Any]] = ContextVar("cvpibztp_span", default={})
+_DISABLED = nullcontext({})
+
+
+class Tracer:
+    """Spans written as Chrome trace events (chrome://tracing, Perfetto).
+
+    Spans nest per thread or task and inherit their parent's arguments, so
+    requests made while provisioning a device carry its serial number.
+    Without a ``path`` spans cost a single check. Only the latest
+    ``max_events`` spans are kept, so a long-running watch stays bounded.
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, max_events: Optional[int] = 100_000
+    ) -> None:
+        self.path = path
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, cat: Optional[str] = "stage", **args) -> ContextManager:
+        if not self.path:
+            return _DISABLED
+        return self._span(name, cat, args)
+
+    @contextmanager
+    def _span(self, name: str, cat: str, args: Dict[str, Any]) -> Iterator[Dict]:
+        args = {**_current.get(), **args}
+        token = _current.set(args)
+        started = time.perf_counter()
+        try:
+            yield args
+        except BaseException as exc:
+            args["error"] = type(exc).__name__
+            raise
+        finally:
+            ended = time.perf_counter()
+            _current.reset(token)
+            thread = threading.current_thread()
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (started - self._origin) * 1e6,
+                "dur": (ended - started) * 1e6,
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+                self._threads[thread.ident] = thread.name
+
+    def write(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in threads.items()
+        ]
+        trace = {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as stream:
+                json.dump(trace, stream, default=str)
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            log.warning("Could not write trace %s: %s", self.path, exc)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import random
+from typing import Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """Retry budget with full-jitter exponential backoff."""
+
+    def __init__(
+        self,
+        attempts: Optional[int] = 4,
+        backoff: Optional[float] = 0.5,
+        max_backoff: Optional[float] = 15.0,
+        statuses: Optional[Iterable[int]] = RETRY_STATUSES,
+    ) -> None:
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(self.max_backoff, float(retry_after)))
+        return delay
+
+
+def make_session(pool_size: Optional[int] = 10) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
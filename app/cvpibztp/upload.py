@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+
+Progress = Callable[[int, int, float], None]
+
+
+class LogProgress:
+    """Log upload progress and throughput every ``step`` percent."""
+
+    def __init__(self, name: str, step: Optional[int] = 10) -> None:
+        self.name = name
+        self.step = step
+        self._next = 0
+
+    def __call__(self, sent: int, total: int, elapsed: float) -> None:
+        percent = sent * 100 // total if total else 100
+        if sent == 0:
+            self._next = 0
+        if percent < self._next and sent < total:
+            return
+        self._next = percent + self.step
+        rate = sent / elapsed / (1 << 20) if elapsed else 0.0
+        log.info("Uploading %s: %d%% (%.1f MiB/s)", self.name, percent, rate)
+
+
+class MultipartFile:
+    """multipart/form-data body that streams a file from disk in chunks.
+
+    The body has a fixed length, so it is sent with Content-Length, and it
+    re-reads the file from the start each time it is iterated, which lets the
+    transport retry an upload without buffering it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        field: Optional[str] = "file",
+        chunk_size: Optional[int] = CHUNK_SIZE,
+        progress: Optional[Progress] = None,
+    ) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(path)
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self.size = os.path.getsize(path)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._head) + self.size + len(self._tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        started = time.monotonic()
+        sent = 0
+        if self.progress:
+            self.progress(sent, self.size, 0.0)
+        yield self._head
+        with open(self.path, "rb") as io:
+            while chunk := io.read(self.chunk_size):
+                sent += len(chunk)
+                yield chunk
+                if self.progress:
+                    self.progress(sent, self.size, time.monotonic() - started)
+        yield self._tail
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from cvpibztp.cloudvision import CvpWarning
+from cvpibztp.sync import FAILED, format_summary, sync_configlets
+
+log = logging.getLogger(__name__)
+
+CONFIGLETS = Path(__file__).resolve().parent.parent / "configlets"
+
+
+def upload(cvp, workers: int, configlets: Optional[Path] = None) -> bool:
+    """Create the image bundle and containers and sync the configlets.
+
+    Returns True when every configlet synced.
+    """
+    bundle_name = "DefaultBundle"
+    image_names = {"EOS64-4.23.4.2M.swi", "TerminAttr-1.9.6-1.swix"}
+    bundle_id = cvp.create_image_bundle(bundle_name, *image_names).get("id")
+    _ = cvp.associate_image_bundle(
+        bundle_id=bundle_id,
+        bundle_name=bundle_name,
+        to_id="root",
+        to_id_type="container",
+        to_name="Tenant",
+        save=True,
+    )
+
+    changed = False
+    containers = {"Leaf", "Spine", "MGMT-ToR", "MGMT-Spine"}
+    for container in containers:
+        try:
+            _ = cvp.add_container(
+                container_name=container,
+                to_id="root",
+                to_name="Tenant",
+                save=False,
+            )
+            changed = True
+        except CvpWarning:
+            continue
+    if changed:
+        _ = cvp._save_topology()
+
+    summary = sync_configlets(cvp, configlets or CONFIGLETS, workers=workers)
+    print(format_summary(summary))
+    return not summary[FAILED]
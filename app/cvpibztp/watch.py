@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+class AdaptiveInterval:
+    """Poll interval that resets on activity and backs off while idle."""
+
+    def __init__(
+        self,
+        minimum: Optional[float] = 5.0,
+        maximum: Optional[float] = 120.0,
+        factor: Optional[float] = 2.0,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.factor = factor
+        self.current = minimum
+
+    def next(self, active: bool) -> float:
+        if active:
+            self.current = self.minimum
+        else:
+            self.current = min(self.maximum, self.current * self.factor)
+        return self.current
+
+
+class InventoryWatcher:
+    """Report devices that appeared in a container since the previous poll."""
+
+    def __init__(self, cvp, container: Optional[str] = "undefined_container") -> None:
+        self.cvp = cvp
+        self.container = container
+        self.changed = False
+        self._seen: Set[str] = set()
+        self._retry: Set[str] = set()
+
+    def poll(self) -> List[Dict[str, Any]]:
+        devices = {
+            device["serialNumber"]: device
+            for device in self.cvp.get_inventory(container=self.container)
+        }
+        new = [device for serial, device in devices.items() if serial not in self._seen]
+        self.changed = any(device["serialNumber"] not in self._retry for device in new)
+        self._seen = set(devices)
+        self._retry &= self._seen
+        return new
+
+    def retry(self, devices: Iterable[Dict[str, Any]]) -> None:
+        """Report ``devices`` again on the next poll if they are still present."""
+        serials = {device["serialNumber"] for device in devices}
+        self._seen -= serials
+        self._retry |= serials
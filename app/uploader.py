@@ -1,56 +1,14 @@
 #!/usr/bin/env python
 
 import logging
-from pathlib import Path
 
-from cvpibztp.cloudvision import ConvCloudVision, CvpWarning
-from cvpibztp.common import connection_details
+from cvpibztp.cli import main as cli
 
 logging.basicConfig(level="DEBUG")
-log = logging.getLogger(__name__)
 
 
 def main():
-    with ConvCloudVision(**connection_details()) as cvp:
-        bundle_name = "DefaultBundle"
-        image_names = {"EOS64-4.23.4.2M.swi", "TerminAttr-1.9.6-1.swix"}
-        bundle_id = cvp.create_image_bundle(bundle_name, *image_names).get("id")
-        _ = cvp.associate_image_bundle(
-            bundle_id=bundle_id,
-            bundle_name=bundle_name,
-            to_id="root",
-            to_id_type="container",
-            to_name="Tenant",
-            save=True,
-        )
-
-        changed = False
-        containers = {"Leaf", "Spine", "MGMT-ToR", "MGMT-Spine"}
-        for container in containers:
-            try:
-                _ = cvp.add_container(
-                    container_name=container,
-                    to_id="root",
-                    to_name="Tenant",
-                    save=False,
-                )
-                changed = True
-            except CvpWarning:
-                continue
-        if changed:
-            _ = cvp._save_topology()
-
-        path = Path(__file__).parent / "configlets"
-        configlets = path.iterdir()
-        for configlet in configlets:
-            if configlet.name.endswith(".py"):
-                func = cvp.add_configlet_builder
-            else:
-                func = cvp.add_configlet
-            try:
-                func(data=configlet.read_text(), name=configlet.name)
-            except CvpWarning:
-                continue
+    cli(["upload"])
 
 
 if __name__ == "__main__":
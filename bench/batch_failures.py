@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Provision against the mock with rejected temp actions and check the outcome.
+
+One device's move and another's configlet association are refused, and a
+third action is refused once so its whole chunk falls back to single posts.
+The refused devices must fail alone, leave nothing pending, and succeed when
+retried like the watch loop does, without refreshing the topology first.
+Upload and provisioning share one client, as in run-all, and executing the
+tasks must leave the image bundle's task alone.
+"""
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from run import IMAGES, environment, populate, seed
+
+from mockcvp import MockCloudVision
+
+COUNT = 250
+
+
+def rejecting(move, associate, once):
+    refused = set()
+
+    def reject(action):
+        node_type = action.get("nodeType")
+        target = action.get("nodeName" if node_type == "netelement" else "toName")
+        kind = (node_type, target)
+        if kind in {("netelement", move), ("configlet", associate)}:
+            return f"{target} is locked"
+        if kind == ("configlet", once) and once not in refused:
+            refused.add(once)
+            return f"{target} is busy"
+        return None
+
+    return reject
+
+
+def provision(cvp, devices):
+    from cvpibztp.autoprovision import load_seed_data, provision
+    from cvpibztp.catalogue import ConfigletCatalogue
+    from cvpibztp.engine import Engine
+
+    catalogue = ConfigletCatalogue(cvp)
+    catalogue.refresh()
+    failed, _, task_ids = provision(
+        cvp, Engine(workers=8), catalogue, load_seed_data(cvp), devices
+    )
+    return {device["serialNumber"] for device in failed}, task_ids
+
+
+def main() -> None:
+    from cvpibztp.autoprovision import settle_tasks
+    from cvpibztp.cloudvision import ConvCloudVision
+    from cvpibztp.common import connection_details
+    from cvpibztp.uploader import upload
+
+    server = MockCloudVision().start()
+    populate(server, COUNT)
+    workdir = tempfile.mkdtemp(prefix="cvpibztp-bench-")
+    for image in IMAGES:
+        Path(workdir, image).write_bytes(os.urandom(1 << 10))
+    os.chdir(workdir)
+    state = server.state
+    with environment(
+        CVPIBZTP_SERVER=server.address,
+        CVPIBZTP_SCHEME="http",
+        CVPIBZTP_USERNAME="cvpadmin",
+        CVPIBZTP_PASSWORD="cvpadmin",
+        CVPIBZTP_DIGEST_CACHE=str(Path(workdir, "digests.json")),
+    ):
+        with ConvCloudVision(**connection_details()) as cvp:
+            upload(cvp, workers=8)
+            bundle_tasks = set(state.tasks)
+            seed(server, COUNT)
+            by_name = {device["fqdn"]: device for device in state.devices.values()}
+            containers = {c["name"]: key for key, c in state.containers.items()}
+
+            server.reject = rejecting("localhost-4", "localhost-5", "localhost-6")
+            devices = cvp.get_inventory(container="undefined_container")
+            failed, task_ids = provision(cvp, devices)
+            assert failed == {"SSJ00000004", "SSJ00000005"}, failed
+            assert not state.temp_actions, len(state.temp_actions)
+            assert by_name["localhost-4"]["parentContainerKey"] == (
+                "undefined_container"
+            )
+            assert by_name["localhost-4"]["key"] not in state.associations
+            assert by_name["localhost-5"]["key"] not in state.associations
+            assert len(state.associations) == COUNT - 2, len(state.associations)
+            print(f"{COUNT} devices, 2 refused: {len(state.associations)} associated")
+
+            # the watch retries failed devices without refreshing the topology
+            server.reject = None
+            retry = [d for d in devices if d["serialNumber"] in failed]
+            retried, retry_ids = provision(cvp, retry)
+            assert not retried
+            assert by_name["localhost-4"]["parentContainerKey"] == containers["Leaf"]
+            assert by_name["localhost-4"]["key"] in state.associations
+            assert by_name["localhost-5"]["key"] in state.associations
+            assert not state.temp_actions
+            print(f"retry: {len(state.associations)} associated")
+
+            assert bundle_tasks and not bundle_tasks & set(task_ids + retry_ids)
+            assert not settle_tasks(cvp, task_ids + retry_ids, mode="execute")
+            statuses = {t["workOrderUserDefinedStatus"] for t in state.tasks.values()}
+            assert all(
+                (task["workOrderUserDefinedStatus"] == "Pending")
+                == (task_id in bundle_tasks)
+                for task_id, task in state.tasks.items()
+            ), statuses
+    server.stop()
+    print("ok")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.CRITICAL)
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Run the ztp_l2_domain builder against a fake cvplibrary and check its eAPI calls."""
+
+import runpy
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fakes"))
+
+import cvplibrary  # noqa: E402
+
+BUILDER = (
+    Path(__file__).resolve().parent.parent / "app" / "configlets" / "ztp_l2_domain.py"
+)
+
+# layout: (interfaces, expected ranges)
+CHASSIS = {
+    "48x10G + 6x100G": (
+        [f"Ethernet{port}" for port in range(1, 55)],
+        ["Ethernet1-54"],
+    ),
+    "48x25G + 4x100G breakout": (
+        [f"Ethernet{port}" for port in range(1, 49)]
+        + [f"Ethernet{port}/{lane}" for port in range(49, 53) for lane in range(1, 5)],
+        ["Ethernet1-48"] + [f"Ethernet{port}/1-4" for port in range(49, 53)],
+    ),
+    "128x100G": (
+        [f"Ethernet{port}/1" for port in range(1, 129)],
+        [f"Ethernet{port}/1" for port in range(1, 129)],
+    ),
+    "32x100G, 4-way breakout": (
+        [f"Ethernet{port}/{lane}" for port in range(1, 33) for lane in range(1, 5)],
+        [f"Ethernet{port}/1-4" for port in range(1, 33)],
+    ),
+    "modular 8x48": (
+        [f"Ethernet{card}/{port}" for card in range(3, 11) for port in range(1, 49)],
+        [f"Ethernet{card}/1-48" for card in range(3, 11)],
+    ),
+}
+
+
+def configured(calls):
+    return [
+        cmd[len("interface ") :]
+        for call in calls
+        for cmd in call
+        if cmd.startswith("interface Ethernet")
+    ]
+
+
+def report(label, interfaces, calls) -> None:
+    print(f"{label:<26} {len(interfaces):>4} ports  {len(calls)} eAPI calls")
+
+
+def run(interfaces, rejected=()):
+    cvplibrary.INTERFACES = interfaces
+    cvplibrary.REJECTED = {f"interface {name}" for name in rejected}
+    cvplibrary.CALLS.clear()
+    error = None
+    try:
+        runpy.run_path(str(BUILDER))
+    except RuntimeError as exc:
+        error = exc
+    return list(cvplibrary.CALLS), error
+
+
+def main() -> None:
+    for label, (interfaces, ranges) in CHASSIS.items():
+        calls, error = run(interfaces)
+        # show interfaces status, the SVI, then every range in one call
+        assert error is None, error
+        assert len(calls) == 3, (label, len(calls))
+        assert "interface vlan 1" in calls[1], calls[1]
+        assert configured(calls) == ranges, (label, configured(calls))
+        report(label, interfaces, calls)
+
+    # A rejected range falls back to one call per range and fails alone
+    interfaces, ranges = CHASSIS["modular 8x48"]
+    calls, error = run(interfaces, rejected=["Ethernet5/1-48"])
+    assert len(calls) == 3 + len(ranges), len(calls)
+    assert configured(calls[3:]) == ranges
+    assert error is not None and "Ethernet5/1-48" in str(error), error
+    assert "Ethernet3/1-48" not in str(error)
+    report("one range rejected", interfaces, calls)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
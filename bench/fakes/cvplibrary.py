@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Minimal stand-in for CloudVision's cvplibrary, recording eAPI calls."""
+
+CALLS = []
+# Commands the fake switch rejects, failing the whole runCmds call
+REJECTED = set()
+INTERFACES = ["Ethernet%d" % port for port in range(1, 49)]
+VALUES = {
+    "ZTP_STATE": "true",
+    "CVP_IP": "192.0.2.10",
+    "ZTP_USERNAME": "cvpadmin",
+    "ZTP_PASSWORD": "cvpadmin",
+}
+
+
+class GlobalVariableNames:
+    ZTP_STATE = "ZTP_STATE"
+    CVP_IP = "CVP_IP"
+    ZTP_USERNAME = "ZTP_USERNAME"
+    ZTP_PASSWORD = "ZTP_PASSWORD"
+
+
+class CVPGlobalVariables:
+    @staticmethod
+    def getValue(name):
+        return VALUES[name]
+
+
+class Device:
+    def __init__(self, ip, username, password):
+        self.ip = ip
+
+    def runCmds(self, commands):
+        CALLS.append(list(commands))
+        for command in commands:
+            if command in REJECTED:
+                raise RuntimeError("CLI command rejected: %s" % command)
+        responses = [{"response": {}} for _ in commands]
+        if "show interfaces status" in commands:
+            index = commands.index("show interfaces status")
+            statuses = {name: {"linkStatus": "notconnect"} for name in INTERFACES}
+            statuses["Management1"] = {"linkStatus": "connected"}
+            responses[index] = {"response": {"interfaceStatuses": statuses}}
+        return responses
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the CloudVision REST endpoints used by cvpibztp."""
+
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+ENTITY_MISSING = 132801
+UNAUTHORIZED = 112498
+INVALID_ACTION = 122401
+AUTH_ENDPOINTS = ("web/login/authenticate.do", "web/login/logout.do")
+
+
+def _page(items: List[Any], query: Dict[str, str]) -> List[Any]:
+    start = int(query.get("startIndex") or 0)
+    end = int(query.get("endIndex") or 0)
+    return items[start:end] if end else items[start:]
+
+
+class MockState:
+    def __init__(self, task_duration: float = 0.0) -> None:
+        self.lock = threading.RLock()
+        self.task_duration = task_duration
+        self.containers: Dict[str, Dict[str, Any]] = {
+            "root": {"key": "root", "name": "Tenant", "parentContainerId": None},
+            "undefined_container": {
+                "key": "undefined_container",
+                "name": "Undefined",
+                "parentContainerId": "root",
+            },
+        }
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self.configlets: Dict[str, Dict[str, Any]] = {}
+        self.builders: Dict[str, Dict[str, Any]] = {}
+        self.images: Dict[str, Dict[str, Any]] = {}
+        self.bundles: Dict[str, Dict[str, Any]] = {}
+        self.associations: Dict[str, List[str]] = {}
+        self.temp_actions: List[Dict[str, Any]] = []
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.sessions: set = set()
+
+    def execute(self, task_ids: List[str]) -> None:
+        finish = time.monotonic() + self.task_duration
+        for task_id in task_ids:
+            if (task := self.tasks.get(str(task_id))) and task[
+                "workOrderUserDefinedStatus"
+            ] == "Pending":
+                task["workOrderUserDefinedStatus"] = "In-Progress"
+                task["finish"] = finish
+
+    def task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if (task := self.tasks.get(task_id)) is None:
+            return None
+        if task.get("finish") and task["finish"] <= time.monotonic():
+            task["workOrderUserDefinedStatus"] = "Completed"
+            task["workOrderState"] = "COMPLETED"
+            del task["finish"]
+        return {key: value for key, value in task.items() if key != "finish"}
+
+    def expire_sessions(self) -> None:
+        self.sessions.clear()
+
+    def add_device(self, serial: str, fqdn: str, ip: str) -> Dict[str, Any]:
+        mac = ":".join(f"{byte:02x}" for byte in uuid.uuid4().bytes[:6])
+        device = {
+            "key": mac,
+            "systemMacAddress": mac,
+            "serialNumber": serial,
+            "fqdn": fqdn,
+            "hostname": fqdn,
+            "ipAddress": ip,
+            "parentContainerKey": "undefined_container",
+            "parentContainerId": "undefined_container",
+            "modelName": "DCS-7050SX3-48YC8",
+            "version": "4.23.4.2M",
+        }
+        self.devices[mac] = device
+        return device
+
+    def add_configlet(self, name: str, config: str) -> Dict[str, Any]:
+        configlet = {
+            "key": f"configlet_{uuid.uuid4().hex[:12]}",
+            "name": name,
+            "config": config,
+            "type": "Static",
+        }
+        self.configlets[name] = configlet
+        return configlet
+
+    def find_configlet(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.configlets.get(name) or self.builders.get(name)
+
+    def configlet_by_key(self, key: str) -> Optional[Dict[str, Any]]:
+        for configlet in list(self.configlets.values()) + list(self.builders.values()):
+            if configlet["key"] == key:
+                return configlet
+        return None
+
+    def save(self) -> List[str]:
+        task_ids = []
+        for action in self.temp_actions:
+            node_type, kind = action.get("nodeType"), action.get("action")
+            if node_type == "container" and kind == "add":
+                key = f"container_{uuid.uuid4().hex[:12]}"
+                self.containers[key] = {
+                    "key": key,
+                    "name": action["nodeName"],
+                    "parentContainerId": action.get("toId"),
+                }
+            elif node_type == "netelement" and kind == "update":
+                if device := self.devices.get(action.get("nodeId")):
+                    device["parentContainerKey"] = action["toId"]
+                    device["parentContainerId"] = action["toId"]
+            elif node_type == "configlet" and kind == "associate":
+                device_id = action.get("toId")
+                self.associations[device_id] = list(action.get("configletList", []))
+                task_ids.append(self._add_task(device_id))
+            elif node_type == "imagebundle" and kind == "associate":
+                # the image upgrade task of the applied bundle
+                task_ids.append(self._add_task(action.get("toId")))
+        self.temp_actions.clear()
+        return task_ids
+
+    def _add_task(self, element_id: str) -> str:
+        task_id = str(len(self.tasks) + 1)
+        device = self.devices.get(element_id, {})
+        self.tasks[task_id] = {
+            "workOrderId": task_id,
+            "workOrderUserDefinedStatus": "Pending",
+            "workOrderState": "ACTIVE",
+            "netElementId": element_id,
+            "workOrderDetails": {
+                "netElementId": element_id,
+                "netElementHostName": device.get("fqdn"),
+                "serialNumber": device.get("serialNumber"),
+            },
+        }
+        return task_id
+
+
+class MockCloudVision(ThreadingHTTPServer):
+    """Threaded HTTP server holding an in-memory CloudVision state.
+
+    ``latency`` seconds are added to every request and ``error_rate`` of the
+    requests fail with a 503 before they touch the state. Executed tasks
+    complete ``task_duration`` seconds later. With a ``capacity``, latency
+    grows with the requests in flight beyond it and more than twice that
+    many are refused with a 429. ``reject`` may be set to a callable that
+    returns an error message for a temp action CloudVision should refuse;
+    addTempAction.do then fails for the whole request.
+    """
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        task_duration: float = 0.0,
+        capacity: int = 0,
+    ) -> None:
+        super().__init__(address, MockHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.inflight = 0
+        self.overloaded: Counter = Counter()
+        self._inflight_lock = threading.Lock()
+        self.state = MockState(task_duration)
+        self.reject: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None
+        self.requests: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def enter(self) -> int:
+        with self._inflight_lock:
+            self.inflight += 1
+            return self.inflight
+
+    def leave(self) -> None:
+        with self._inflight_lock:
+            self.inflight -= 1
+
+    def start(self) -> "MockCloudVision":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, data: Any, status: int = 200) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.session_id:
+            self.send_header("Set-Cookie", f"session_id={self.session_id}; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _dispatch(self, method: str) -> None:
+        server: MockCloudVision = self.server
+        inflight = server.enter()
+        try:
+            self._handle(method, inflight)
+        finally:
+            server.leave()
+
+    def _handle(self, method: str, inflight: int) -> None:
+        server: MockCloudVision = self.server
+        url = urlsplit(self.path)
+        endpoint = url.path.strip("/")
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self._body()
+        self.session_id = None
+        server.requests[endpoint] += 1
+        if server.capacity and inflight > 2 * server.capacity:
+            server.overloaded[endpoint] += 1
+            self._send({"errorMessage": "Too many requests"}, status=429)
+            return
+        if server.latency:
+            time.sleep(
+                server.latency * max(1.0, inflight / (server.capacity or inflight))
+            )
+        if server.error_rate and random.random() < server.error_rate:
+            self._send({"errorMessage": "injected"}, status=503)
+            return
+        cookie = SimpleCookie(self.headers.get("Cookie") or "").get("session_id")
+        if endpoint not in AUTH_ENDPOINTS and (
+            cookie is None or cookie.value not in server.state.sessions
+        ):
+            self._send(
+                {"errorCode": str(UNAUTHORIZED), "errorMessage": "Unauthorized User"}
+            )
+            return
+        handler = getattr(
+            self, f"{method}_{endpoint.rsplit('/', 1)[-1].replace('.', '_')}", None
+        )
+        if handler is None:
+            self._send({"errorMessage": f"Unknown endpoint {endpoint}"}, status=404)
+            return
+        payload = body
+        if body and "json" in (self.headers.get("Content-Type") or ""):
+            payload = json.loads(body)
+        with server.state.lock:
+            response = handler(server.state, query, payload)
+        if isinstance(response, tuple):
+            self._send(*response)
+        else:
+            self._send(response)
+
+    def do_GET(self) -> None:
+        self._dispatch("get")
+
+    def do_POST(self) -> None:
+        self._dispatch("post")
+
+    # authentication
+
+    def post_authenticate_do(self, state, query, payload):
+        self.session_id = uuid.uuid4().hex
+        state.sessions.add(self.session_id)
+        return {"sessionId": self.session_id, "username": payload.get("userId")}
+
+    def post_logout_do(self, state, query, payload):
+        if cookie := SimpleCookie(self.headers.get("Cookie") or "").get("session_id"):
+            state.sessions.discard(cookie.value)
+        return {"data": "success"}
+
+    def get_getCvpInfo_do(self, state, query, payload):
+        return {"version": "2020.2.0"}
+
+    # inventory and topology
+
+    def get_devices(self, state, query, payload):
+        return list(state.devices.values())
+
+    def get_searchTopology_do(self, state, query, payload):
+        term = query.get("queryParam", "")
+        containers = [c for c in state.containers.values() if term in c["name"]]
+        devices = [d for d in state.devices.values() if term in d["fqdn"]]
+        return {
+            "containerList": _page(containers, query),
+            "netElementList": _page(devices, query),
+            "total": len(containers) + len(devices),
+        }
+
+    def post_addTempAction_do(self, state, query, payload):
+        actions = payload.get("data", [])
+        if self.server.reject:
+            errors = [error for error in map(self.server.reject, actions) if error]
+            if errors:
+                message = "; ".join(errors)
+                return {"errorCode": str(INVALID_ACTION), "errorMessage": message}
+        state.temp_actions.extend(actions)
+        return {"data": "success"}
+
+    def get_deleteAllTempAction_do(self, state, query, payload):
+        state.temp_actions.clear()
+        return {"data": "success"}
+
+    def post_saveTopology_do(self, state, query, payload):
+        return {"data": {"status": "success", "taskIds": state.save()}}
+
+    def get_getTempConfigsByNetElementId_do(self, state, query, payload):
+        return {"proposedConfiglets": [], "reconciledConfig": None}
+
+    def get_getConfigletsByNetElementId_do(self, state, query, payload):
+        keys = state.associations.get(query.get("netElementId"), [])
+        configlets = [state.configlet_by_key(key) for key in keys]
+        configlets = [configlet for configlet in configlets if configlet]
+        return {"configletList": _page(configlets, query), "total": len(configlets)}
+
+    # configlets
+
+    def get_getConfigletByName_do(self, state, query, payload):
+        if configlet := state.find_configlet(query.get("name")):
+            return configlet
+        return {
+            "errorCode": str(ENTITY_MISSING),
+            "errorMessage": "Entity does not exist",
+        }
+
+    def get_getConfiglets_do(self, state, query, payload):
+        source = state.builders if query.get("type") == "Builder" else state.configlets
+        configlets = list(source.values())
+        return {"data": _page(configlets, query), "total": len(configlets)}
+
+    def get_searchConfiglets_do(self, state, query, payload):
+        term = query.get("queryparam", "")
+        configlets = [c for c in state.configlets.values() if term in c["name"]]
+        return {"data": _page(configlets, query), "total": len(configlets)}
+
+    def get_getConfigletBuilder_do(self, state, query, payload):
+        for builder in state.builders.values():
+            if builder["key"] == query.get("id"):
+                return {"data": {"main_script": {"data": builder["script"]}}}
+        return {
+            "errorCode": str(ENTITY_MISSING),
+            "errorMessage": "Entity does not exist",
+        }
+
+    def post_addConfiglet_do(self, state, query, payload):
+        if payload["name"] in state.configlets:
+            return {"errorCode": "132518", "errorMessage": "Data already exists"}
+        return {"data": state.add_configlet(payload["name"], payload["config"])}
+
+    def post_updateConfiglet_do(self, state, query, payload):
+        state.configlets[payload["name"]]["config"] = payload["config"]
+        return {"data": "Configlet is successfully updated"}
+
+    def post_addConfigletBuilder_do(self, state, query, payload):
+        if payload["name"] in state.builders:
+            return {"errorCode": "132823", "errorMessage": "Builder name already exist"}
+        builder = {
+            "key": f"configletBuilder_{uuid.uuid4().hex[:12]}",
+            "name": payload["name"],
+            "script": payload["data"]["main_script"]["data"],
+            "type": "Builder",
+        }
+        state.builders[payload["name"]] = builder
+        return {"data": builder}
+
+    def post_updateConfigletBuilder_do(self, state, query, payload):
+        state.builders[payload["name"]]["script"] = payload["data"]["main_script"][
+            "data"
+        ]
+        return {"data": "success"}
+
+    def post_autoConfigletGenerator_do(self, state, query, payload):
+        generated = []
+        for net_element_id in payload.get("netElementIds", []):
+            device = state.devices.get(net_element_id, {})
+            name = f"SYS_{device.get('fqdn', net_element_id)}_ztp_l2_domain"
+            configlet = state.add_configlet(
+                name, "interface Vlan1\n   ip address dhcp\n"
+            )
+            configlet["type"] = "Generated"
+            generated.append({"netElementId": net_element_id, "configlet": configlet})
+        return {"data": generated}
+
+    # tasks
+
+    def get_getTaskById_do(self, state, query, payload):
+        if task := state.task(query.get("taskId")):
+            return task
+        return {"errorCode": "142501", "errorMessage": "Invalid task id"}
+
+    def get_getTasks_do(self, state, query, payload):
+        # newest first, like CloudVision
+        tasks = [state.task(task_id) for task_id in reversed(list(state.tasks))]
+        return {"data": _page(tasks, query), "total": len(tasks)}
+
+    def post_executeTask_do(self, state, query, payload):
+        state.execute(payload.get("data", []))
+        return {"data": "success"}
+
+    # images
+
+    def get_getImages_do(self, state, query, payload):
+        term = query.get("queryparam", "")
+        images = [image for image in state.images.values() if term in image["name"]]
+        return {"data": _page(images, query), "total": len(images)}
+
+    def post_addImage_do(self, state, query, payload):
+        header = payload[: payload.find(b"\r\n\r\n")].decode(errors="replace")
+        name = header.split('filename="', 1)[-1].split('"', 1)[0]
+        if name in state.images:
+            return {"errorCode": "162876", "errorMessage": "Image already exists"}
+        image = {
+            "name": name,
+            "key": f"image_{uuid.uuid4().hex[:12]}",
+            "imageSize": str(len(payload)),
+        }
+        state.images[name] = image
+        return {"result": "success", **image}
+
+    def get_getImageBundleByName_do(self, state, query, payload):
+        if bundle := state.bundles.get(query.get("name")):
+            return bundle
+        return {"errorCode": "162801", "errorMessage": "Entity does not exist"}
+
+    def get_getImageBundles_do(self, state, query, payload):
+        bundles = list(state.bundles.values())
+        return {"data": _page(bundles, query), "total": len(bundles)}
+
+    def post_saveImageBundle_do(self, state, query, payload):
+        bundle = {
+            "id": f"imagebundle_{uuid.uuid4().hex[:12]}",
+            "name": payload["name"],
+            "images": payload["images"],
+            "isCertifiedImage": payload["isCertifiedImage"],
+        }
+        state.bundles[payload["name"]] = bundle
+        return {"data": "success"}
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Run uploader and autoprovision against a local mock CloudVision.
+
+python bench/run.py --devices 10 100 1000 --latency 0.005
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mockcvp import MockCloudVision  # noqa: E402
+
+IMAGES = ("EOS64-4.23.4.2M.swi", "TerminAttr-1.9.6-1.swix")
+CONTAINERS = ("Leaf", "Spine", "MGMT-ToR", "MGMT-Spine")
+
+
+def populate(server: MockCloudVision, count: int) -> None:
+    state = server.state
+    for index in range(count):
+        serial = f"SSJ{index:08d}"
+        ip = f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"
+        state.add_device(serial, fqdn=f"localhost-{index}", ip=ip)
+        state.add_configlet(f"ds_sw{index:05d}_base", f"hostname sw{index:05d}\n")
+
+
+def seed(server: MockCloudVision, count: int, seed_format: str = "yaml") -> str:
+    entries = [
+        (f"sw{index:05d}", CONTAINERS[index % len(CONTAINERS)], f"SSJ{index:08d}")
+        for index in range(count)
+    ]
+    if seed_format == "jsonl":
+        lines = [
+            json.dumps({"name": name, "container": container, "serial": serial})
+            for name, container, serial in entries
+        ]
+    elif seed_format == "csv":
+        lines = ["name,container,serial"] + [",".join(entry) for entry in entries]
+    else:
+        lines = ["---"] + [
+            f"- name: {name}\n  container: {container}\n  serial: {serial}"
+            for name, container, serial in entries
+        ]
+    name = f"ztp_seed_data.{seed_format}"
+    server.state.add_configlet(name, "\n".join(lines) + "\n")
+    return name
+
+
+@contextmanager
+def environment(**values):
+    saved = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def measure(label: str, func, server: MockCloudVision) -> dict:
+    server.requests.clear()
+    server.overloaded.clear()
+    tracemalloc.start()
+    started = time.perf_counter()
+    status, error = "ok", None
+    try:
+        func()
+    except SystemExit as exc:
+        status = f"exit {exc.code}"
+    except Exception as exc:
+        status, error = "error", f"{type(exc).__name__}: {exc}"
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "stage": label,
+        "status": status,
+        "error": error,
+        "seconds": elapsed,
+        "requests": sum(server.requests.values()),
+        "refused": sum(server.overloaded.values()),
+        "peak_mib": peak / (1 << 20),
+    }
+
+
+def run(
+    count: int,
+    latency: float,
+    error_rate: float,
+    workers: int,
+    task_duration: Optional[float] = None,
+    capacity: int = 0,
+    seed_format: str = "yaml",
+) -> list:
+    import autoprovision
+    import uploader
+
+    # stages import lazily; load them here so the timings cover the run only
+    import cvpibztp.autoprovision  # noqa: F401
+    import cvpibztp.uploader  # noqa: F401
+
+    server = MockCloudVision(
+        latency=latency,
+        error_rate=error_rate,
+        task_duration=task_duration or 0.0,
+        capacity=capacity,
+    ).start()
+    populate(server, count)
+    workdir = tempfile.mkdtemp(prefix="cvpibztp-bench-")
+    for image in IMAGES:
+        Path(workdir, image).write_bytes(os.urandom(1 << 16))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with environment(
+            CVPIBZTP_SERVER=server.address,
+            CVPIBZTP_SCHEME="http",
+            CVPIBZTP_USERNAME="cvpadmin",
+            CVPIBZTP_PASSWORD="cvpadmin",
+            CVPIBZTP_WORKERS=str(workers),
+            CVPIBZTP_DIGEST_CACHE=str(Path(workdir, "digests.json")),
+            CVPIBZTP_TASKS="execute" if task_duration is not None else "",
+        ):
+            results = [measure("upload", uploader.main, server)]
+            # uploader pushes the repo's own seed file; replace it with the fleet
+            with environment(CVPIBZTP_SEED=seed(server, count, seed_format)):
+                results.append(measure("provision", autoprovision.main, server))
+    finally:
+        os.chdir(cwd)
+        server.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        default=0,
+        help="concurrent requests the mock serves before it slows down",
+    )
+    parser.add_argument(
+        "--task-duration",
+        type=float,
+        help="execute the saved tasks and wait until they complete",
+    )
+    parser.add_argument(
+        "--seed-format",
+        choices=("yaml", "jsonl", "csv"),
+        default="yaml",
+        help="format of the seed configlet",
+    )
+    args = parser.parse_args()
+
+    import autoprovision  # noqa: F401  (configures logging on import)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    print(
+        f"{'devices':>8} {'stage':<10} {'status':<8} {'seconds':>8} {'requests':>9} "
+        f"{'refused':>8} {'peak MiB':>9}"
+    )
+    for count in args.devices:
+        for result in run(
+            count,
+            args.latency,
+            args.error_rate,
+            args.workers,
+            args.task_duration,
+            args.capacity,
+            args.seed_format,
+        ):
+            print(
+                f"{count:>8} {result['stage']:<10} {result['status']:<8} "
+                f"{result['seconds']:>8.2f} {result['requests']:>9} "
+                f"{result['refused']:>8} {result['peak_mib']:>9.1f}"
+            )
+            if result["error"]:
+                print(f"{'':>8} {result['error']}")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"max RSS {rss:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
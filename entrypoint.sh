@@ -1,4 +1,10 @@
 #!/usr/bin/env bash
 
-cd /app && python uploader.py || exit 1
-python autoprovision.py || exit 1
+# Reuse the CloudVision login across container restarts
+export CVPIBZTP_SESSION_FILE="${CVPIBZTP_SESSION_FILE:-/tmp/cvpibztp/session.json}"
+# Resume an interrupted provisioning run after a restart
+export CVPIBZTP_CHECKPOINT="${CVPIBZTP_CHECKPOINT:-/tmp/cvpibztp/checkpoint.db}"
+# Skip re-parsing the seed configlet while its content is unchanged
+export CVPIBZTP_SEED_CACHE="${CVPIBZTP_SEED_CACHE:-/tmp/cvpibztp/seed.json}"
+
+cd /app && exec python -m cvpibztp run-all